@@ -1,31 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from sqlalchemy.orm import Session
-from app.core.db import SessionLocal
-from app.models import User, AuditLog
-from app.core.security import verify_password, create_access_token
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_async_db
+from app.models import User
+from app.core.security import verify_password_async, create_access_token, access_token_claims, DUMMY_PASSWORD_HASH
 from app.core.auth_utils import (
     create_and_store_refresh_token,
     validate_refresh_token,
     revoke_refresh_token,
     revoke_all_user_tokens,
     check_login_attempts,
-    log_login_attempt
+    log_login_attempt,
+    USER_BY_EMAIL,
+    email_lookup_params
 )
 from app.core.rate_limiter import rate_limit, RATE_LIMITS
+from app.core.client_ip import get_client_ip
 from app.schemas.auth import LoginRequest, TokenResponse, RefreshTokenRequest, LogoutRequest
-from app.dependencies import get_current_user
-from datetime import datetime
-import uuid
-
-router = APIRouter(prefix="/auth", tags=["auth"])
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.dependencies import get_current_user, forget_cached_user_async
+from app.services.audit_stream import audit_log_async
+from app.core.timeutils import utc_now
 
+router = APIRouter(prefix="/auth", tags=["auth"], default_response_class=ORJSONResponse)
 
 @router.post("/login", response_model=TokenResponse)
 @rate_limit(
@@ -33,29 +29,34 @@ def get_db():
     window_size=RATE_LIMITS["auth_login"]["window_size"],
     by="ip"
 )
-def login(data: LoginRequest, request: Request, db: Session = Depends(get_db)):
+async def login(data: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Login endpoint with rate limiting and refresh token support.
     Returns access_token and refresh_token.
     
     Rate Limited: 5 requests per 60 seconds per IP address
     """
-    ip_address = request.client.host if request.client else None
+    now = utc_now()
+    ip_address = get_client_ip(request)
     
     # Check rate limiting
-    if not check_login_attempts(data.email, ip_address, db):
+    if not await check_login_attempts(data.email, ip_address):
         # Log the failed attempt
-        log_login_attempt(data.email, ip_address, False, db)
+        await log_login_attempt(data.email, ip_address, False, now)
         raise HTTPException(
             status_code=429,
             detail="Too many failed login attempts. Please try again later."
         )
     
     # Verify user credentials
-    user = db.query(User).filter(User.email == data.email).first()
+    user = (await db.execute(USER_BY_EMAIL, email_lookup_params(data.email))).scalar_one_or_none()
     
-    if not user or not verify_password(data.password, user.password_hash):
-        log_login_attempt(data.email, ip_address, False, db)
+    # Always pay for one bcrypt verify, even for unknown emails
+    password_ok = await verify_password_async(
+        data.password, user.password_hash if user else DUMMY_PASSWORD_HASH
+    )
+    if not user or not password_ok:
+        await log_login_attempt(data.email, ip_address, False, now)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not user.is_active:
@@ -66,27 +67,16 @@ def login(data: LoginRequest, request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="Email not verified. Please verify your email first.")
     
     # Log successful login
-    log_login_attempt(data.email, ip_address, True, db)
+    await log_login_attempt(data.email, ip_address, True, now)
     
     # Create tokens
-    access_token = create_access_token({
-        "sub": user.id,
-        "role": user.role
-    })
-    
-    refresh_token = create_and_store_refresh_token(user.id, db)
-    
-    # Audit log
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=user.id,
-        action="login",
-        target=user.id,
-        event_metadata={"ip_address": ip_address},
-        timestamp=datetime.utcnow()
-    )
-    db.add(audit)
-    db.commit()
+    access_token = create_access_token(access_token_claims(user.id, user.role))
+    
+    refresh_token = await create_and_store_refresh_token(user.id, db, commit=False, now=now)
+    
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    await audit_log_async(db, user.id, "login", user.id, {"ip_address": ip_address}, now=now)
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -95,7 +85,7 @@ def login(data: LoginRequest, request: Request, db: Session = Depends(get_db)):
     }
 
 @router.post("/token/refresh", response_model=TokenResponse)
-def refresh_token(data: RefreshTokenRequest, db: Session = Depends(get_db)):
+async def refresh_token(data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Refresh access token using refresh token.
     
@@ -105,38 +95,30 @@ def refresh_token(data: RefreshTokenRequest, db: Session = Depends(get_db)):
     - Old token is revoked (prevents replay attacks)
     - Returns new access_token + new refresh_token
     """
-    user_id = validate_refresh_token(data.refresh_token, db)
+    now = utc_now()
+    # Token and its user come back from one joined query
+    user = await validate_refresh_token(data.refresh_token, db, now=now)
     
-    if not user_id:
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_active:
+    if not user.is_active:
         raise HTTPException(status_code=403, detail="User no longer active")
     
-    # SECURITY FIX #2: Revoke old token before issuing new one (token rotation)
-    revoke_refresh_token(data.refresh_token, db)
+    # SECURITY FIX #2: Revoke old token before issuing new one (token rotation).
+    # The revoke is atomic, so a token replayed concurrently rotates only once.
+    if not await revoke_refresh_token(data.refresh_token, db, commit=False, user_id=user.id):
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
     
     # Generate new access token
-    access_token = create_access_token({
-        "sub": user.id,
-        "role": user.role
-    })
+    access_token = create_access_token(access_token_claims(user.id, user.role))
     
     # Issue new refresh token (prevents old token from being reused)
-    new_refresh_token = create_and_store_refresh_token(user.id, db)
-    
-    # Audit log
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=user.id,
-        action="token_refresh",
-        target=user.id,
-        event_metadata={},
-        timestamp=datetime.utcnow()
-    )
-    db.add(audit)
-    db.commit()
+    new_refresh_token = await create_and_store_refresh_token(user.id, db, commit=False, now=now)
+    
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    await audit_log_async(db, user.id, "token_refresh", user.id, now=now)
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -145,23 +127,16 @@ def refresh_token(data: RefreshTokenRequest, db: Session = Depends(get_db)):
     }
 
 @router.post("/logout")
-def logout(data: LogoutRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def logout(data: LogoutRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Logout endpoint - revokes the provided refresh token.
     """
-    success = revoke_refresh_token(data.refresh_token, db)
-    
-    # Audit log
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=current_user.id,
-        action="logout",
-        target=current_user.id,
-        event_metadata={},
-        timestamp=datetime.utcnow()
-    )
-    db.add(audit)
-    db.commit()
+    now = utc_now()
+    success = await revoke_refresh_token(data.refresh_token, db, commit=False, user_id=current_user.id)
+    
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    await audit_log_async(db, current_user.id, "logout", current_user.id, now=now)
+    await db.commit()
     
     if success:
         return {"msg": "Logged out successfully"}
@@ -169,23 +144,21 @@ def logout(data: LogoutRequest, current_user: User = Depends(get_current_user),
         raise HTTPException(status_code=400, detail="Invalid refresh token")
 
 @router.post("/logout-all-devices")
-def logout_all_devices(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def logout_all_devices(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Force logout from all devices by revoking all refresh tokens.
     """
-    revoke_all_user_tokens(current_user.id, db)
-    
-    # Audit log
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=current_user.id,
-        action="logout_all_devices",
-        target=current_user.id,
-        event_metadata={},
-        timestamp=datetime.utcnow()
+    now = utc_now()
+    # Shared with the sync admin routes; run it on the async session's sync facade
+    revoked_ids = await db.run_sync(lambda session: revoke_all_user_tokens(current_user.id, session, commit=False))
+    
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    await audit_log_async(
+        db, current_user.id, "logout_all_devices", current_user.id,
+        {"revoked_sessions": len(revoked_ids)}, now=now
     )
-    db.add(audit)
-    db.commit()
+    await db.commit()
+    await forget_cached_user_async(current_user.id)
     
     return {"msg": "Logged out from all devices"}
 
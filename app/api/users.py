@@ -1,20 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, EmailStr, Field
 from sqlalchemy.orm import Session
 from app.schemas.user import UserCreate
-from app.core.db import SessionLocal
+from app.core.db import get_db
 from app.models import User, AuditLog
 from app.core.security import hash_password
 from app.core.constants import DEFAULT_ORG_ID
 
-router = APIRouter(prefix="/users", tags=["users"])
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter(prefix="/users", tags=["users"], default_response_class=ORJSONResponse)
 
 @router.post("/", status_code=201)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
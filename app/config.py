@@ -1,19 +1,35 @@
 # app/config.py
 import os
 import logging
+from types import MappingProxyType
 
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
+# Server-side key for refresh-token digests (a DB leak alone can't forge lookups)
+TOKEN_PEPPER = os.getenv("TOKEN_PEPPER", SECRET_KEY).encode()
 
 # MILESTONE 8: Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 # Map string to logging level
 LOG_LEVEL = getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+
+# Database Configuration
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# Production deploys route through PgBouncer (port 6432, transaction pooling)
+PGBOUNCER_URL = os.getenv("PGBOUNCER_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # Evict idle sockets before Postgres/NAT drops them
+SQL_ECHO = os.getenv("SQL_ECHO", "0").lower() in ("1", "true", "yes")  # Log every statement (local debugging only)
+
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Short-lived access token
 REFRESH_TOKEN_EXPIRE_DAYS = 7  # Longer-lived refresh token
 MAX_SESSIONS_PER_USER = 3  # Limit concurrent sessions
 MAX_LOGIN_ATTEMPTS = 5  # Failed attempts before lockout
+MAX_LOGIN_ATTEMPTS_PER_IP = 20  # Failed attempts per source IP (shared NAT / proxies)
 LOGIN_ATTEMPT_WINDOW_MINUTES = 15  # Time window for rate limiting
+LOGIN_ATTEMPT_RETENTION_DAYS = int(os.getenv("LOGIN_ATTEMPT_RETENTION_DAYS", "30"))  # login_attempts rows kept for reporting
 
 # MILESTONE 6: Identity Hardening
 EMAIL_TOKEN_EXPIRE_MINUTES = 24 * 60  # 24 hours (email verification)
@@ -71,25 +87,53 @@ ROLES = {
     }
 }
 
+# Compact role codes for JWT claims (append only: issued tokens carry these)
+ROLE_CODES = MappingProxyType({"admin": 0, "analyst": 1, "viewer": 2})
+ROLE_BY_CODE = MappingProxyType({code: role for role, code in ROLE_CODES.items()})
+
+# Role-to-permissions lookup (one hash probe per check)
+ROLE_PERMISSIONS = MappingProxyType({
+    role: frozenset(config.get("permissions", []))
+    for role, config in ROLES.items()
+})
+
 # Permission-to-role mapping (reverse lookup)
-PERMISSION_ROLES = {}
-for role, config in ROLES.items():
-    for permission in config.get("permissions", []):
-        if permission not in PERMISSION_ROLES:
-            PERMISSION_ROLES[permission] = []
-        PERMISSION_ROLES[permission].append(role)
+PERMISSION_ROLES = MappingProxyType({
+    permission: frozenset(role for role, perms in ROLE_PERMISSIONS.items() if permission in perms)
+    for permission in frozenset().union(*ROLE_PERMISSIONS.values())
+})
+
+
+def has_permission(role: str, permission: str) -> bool:
+    """Return True if role grants permission."""
+    return permission in ROLE_PERMISSIONS.get(role, ())
 
 # ============================================================================
 # MILESTONE 1 & 2: Event-Driven Risk Engine Configuration
 # ============================================================================
 
+# Number of reverse proxies in front of the API that append to X-Forwarded-For
+# (0 = not behind a proxy; ignore the header). Defaults to 0: the compose files
+# expose uvicorn directly, and trusting a hop nobody appends lets clients pick
+# their own IP. Set it only where N proxies really sit in front.
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+
 # Redis Configuration
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Per-process cap for each shared client's pool (sync and asyncio)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# Upper bound on any single Redis command / connect, so a stalled Redis fails
+# fast instead of hanging the caller. Must exceed the longest blocking read
+# (XREADGROUP block=1000ms in the stream consumers).
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
 
 # Event Streams
 EVENT_STREAM_NAME = "sentineliq:events"
 RISK_STREAM_NAME = "sentineliq:risk_decisions"
 ALERT_STREAM_NAME = "sentineliq:alerts"
+AUDIT_STREAM_NAME = "sentineliq:audit"  # Login attempts, drained to Postgres by audit consumer
+AUDIT_DEAD_LETTER_STREAM_NAME = "sentineliq:audit:dead"  # Audit entries that could not be persisted
 
 # Risk Engine
 RISK_ENGINE_RULES_PATH = os.getenv("RISK_RULES_PATH", "/app/rules/fraud_rules.yaml")
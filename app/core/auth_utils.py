@@ -1,123 +1,259 @@
 # app/core/auth_utils.py
 from datetime import datetime, timedelta
+from sqlalchemy import select, delete, update, bindparam, case, func
+from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import Session
-from app.models import RefreshToken, LoginAttempt, User
-from app.config import REFRESH_TOKEN_EXPIRE_DAYS, MAX_SESSIONS_PER_USER, MAX_LOGIN_ATTEMPTS, LOGIN_ATTEMPT_WINDOW_MINUTES
-from app.core.security import create_refresh_token, hash_password, verify_password
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import RefreshToken, User
+from app.config import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    MAX_SESSIONS_PER_USER,
+    MAX_LOGIN_ATTEMPTS,
+    MAX_LOGIN_ATTEMPTS_PER_IP,
+    LOGIN_ATTEMPT_WINDOW_MINUTES,
+    AUDIT_STREAM_NAME,
+    TOKEN_PEPPER,
+)
+from app.core.security import create_refresh_token
+from app.core.timeutils import utc_now
+from app.services.redis_stream import get_async_redis
+from app.services.audit_stream import AUDIT_STREAM_MAXLEN
+import hashlib
+import hmac
+import logging
 import uuid
 
-def create_and_store_refresh_token(user_id: str, db: Session) -> str:
+logger = logging.getLogger("sentineliq.auth")
+
+# Atomically bump every failed-login counter and start its window on first hit.
+_FAILED_LOGIN_LUA = """
+for i, key in ipairs(KEYS) do
+    if redis.call('INCR', key) == 1 then
+        redis.call('EXPIRE', key, ARGV[1])
+    end
+end
+return 1
+"""
+_failed_login_script = None
+
+# Email lookups are case-insensitive on lower(email) (users_email_lower_idx).
+# Registration refuses case variants, but older rows may still collide; the
+# exact spelling wins, and limit(1) keeps the lookup from raising.
+USER_BY_EMAIL = (
+    select(User)
+    .where(func.lower(User.email) == bindparam("email"))
+    .order_by(case((User.email == bindparam("exact_email"), 0), else_=1))
+    .limit(1)
+)
+
+
+def normalize_email(email: str) -> str:
+    """Case-folded form used for email lookups and per-email counters."""
+    return email.strip().lower()
+
+
+def email_lookup_params(email: str) -> dict:
+    """Bind values for USER_BY_EMAIL."""
+    return {"email": normalize_email(email), "exact_email": email.strip()}
+
+
+def _login_rate_keys(email: str, ip_address: str | None) -> list[str]:
+    """Redis keys for the per-email and per-IP failed-login counters."""
+    email_digest = hashlib.sha256(normalize_email(email).encode()).hexdigest()
+    return [
+        f"rl:auth:login:email:{email_digest}",
+        f"rl:auth:login:ip:{ip_address or 'unknown'}",
+    ]
+
+# Token row + owning user in one round trip (inner join on users' PK)
+_ACTIVE_TOKEN_WITH_USER = (
+    select(RefreshToken)
+    .options(joinedload(RefreshToken.user, innerjoin=True))
+    .where(
+        RefreshToken.token_hash == bindparam("token_hash"),
+        RefreshToken.is_revoked == False,
+        RefreshToken.expires_at > bindparam("now")
+    )
+)
+
+def _digest_token(refresh_token: str) -> bytes:
+    """Fixed-size lookup key for a refresh token: HMAC-SHA256 under TOKEN_PEPPER."""
+    return hmac.new(TOKEN_PEPPER, refresh_token.encode(), hashlib.sha256).digest()
+
+async def create_and_store_refresh_token(user_id: str, db: AsyncSession, commit: bool = True, now: datetime | None = None) -> str:
     """
     Create a refresh token and store it in the database (HASHED).
     Implements concurrent session limits.
     
+    Pass commit=False to leave the insert in the caller's transaction, and
+    the handler's `now` to avoid re-reading the clock.
+    
     Security:
-    - Tokens are hashed before storage (like passwords)
+    - Only the peppered HMAC-SHA256 digest is stored (indexed, non-reversible)
     - Plain token returned to client
-    - Only hashed version stored in DB
+    - The token is 256 bits of randomness, so a slow KDF adds nothing
     """
-    # Check existing tokens
-    existing_tokens = db.query(RefreshToken).filter(
-        RefreshToken.user_id == user_id,
-        RefreshToken.is_revoked == False,
-        RefreshToken.expires_at > datetime.utcnow()
-    ).all()
+    now = now or utc_now()
     
-    # Delete oldest token if at max sessions
-    if len(existing_tokens) >= MAX_SESSIONS_PER_USER:
-        oldest = min(existing_tokens, key=lambda t: t.created_at)
-        db.delete(oldest)
-        db.commit()
+    # One DELETE makes room for the new session: every active token past the
+    # newest MAX_SESSIONS_PER_USER - 1 goes (usually none, at most the oldest)
+    surplus_tokens = (
+        select(RefreshToken.id)
+        .where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.is_revoked == False,
+            RefreshToken.expires_at > now
+        )
+        .order_by(RefreshToken.created_at.desc())
+        .offset(MAX_SESSIONS_PER_USER - 1)
+    )
+    await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.id.in_(surplus_tokens))
+        .execution_options(synchronize_session=False)
+    )
     
     # Create new refresh token
     refresh_token = create_refresh_token()
-    # SECURITY FIX #1: Hash the token before storage
-    hashed_token = hash_password(refresh_token)
-    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    expires_at = now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     
     db_refresh_token = RefreshToken(
         id=str(uuid.uuid4()),
         user_id=user_id,
-        token=hashed_token,  # Store HASHED token
+        token_hash=_digest_token(refresh_token),  # Store digest only
         expires_at=expires_at,
-        is_revoked=False
+        is_revoked=False,
+        created_at=now
     )
     db.add(db_refresh_token)
-    db.commit()
+    if commit:
+        await db.commit()
     
     # Return PLAIN token (client will send this back)
     return refresh_token
 
-def check_login_attempts(email: str, ip_address: str | None, db: Session) -> bool:
+async def check_login_attempts(email: str, ip_address: str | None) -> bool:
     """
     Check if user has exceeded max login attempts.
     Returns True if user can attempt login, False if locked out.
-    """
-    time_window = datetime.utcnow() - timedelta(minutes=LOGIN_ATTEMPT_WINDOW_MINUTES)
     
-    failed_attempts = db.query(LoginAttempt).filter(
-        LoginAttempt.email == email,
-        LoginAttempt.success == False,
-        LoginAttempt.timestamp > time_window
-    ).count()
+    Counters live in Redis (see log_login_attempt); fails open if Redis is down.
+    """
+    try:
+        email_failures, ip_failures = await get_async_redis().mget(
+            _login_rate_keys(email, ip_address)
+        )
+    except Exception as e:
+        logger.error(f"Login attempt check failed: {e}")
+        return True
     
-    return failed_attempts < MAX_LOGIN_ATTEMPTS
-
-def log_login_attempt(email: str, ip_address: str | None, success: bool, db: Session):
-    """Log a login attempt for rate limiting and security auditing"""
-    attempt = LoginAttempt(
-        id=str(uuid.uuid4()),
-        email=email,
-        ip_address=ip_address,
-        success=success,
-        timestamp=datetime.utcnow()
+    return (
+        int(email_failures or 0) < MAX_LOGIN_ATTEMPTS
+        and int(ip_failures or 0) < MAX_LOGIN_ATTEMPTS_PER_IP
     )
-    db.add(attempt)
-    db.commit()
 
-def revoke_refresh_token(refresh_token: str, db: Session) -> bool:
+async def log_login_attempt(email: str, ip_address: str | None, success: bool, now: datetime | None = None):
     """
-    Mark a refresh token as revoked (logout).
-    Must verify hashed token before revoking.
-    """
-    # Find all tokens for this user and check hash
-    all_tokens = db.query(RefreshToken).filter(
-        RefreshToken.is_revoked == False
-    ).all()
+    Log a login attempt for rate limiting and security auditing.
     
-    for db_token in all_tokens:
-        # Verify the plain token against hashed version
-        if verify_password(refresh_token, db_token.token):
-            db_token.is_revoked = True
-            db.commit()
-            return True
+    Failures bump the Redis lockout counters; a success clears the account's
+    counter (the per-IP counter keeps running, so one valid login can't reset
+    a spraying source). Every attempt is appended to the audit stream and
+    persisted to login_attempts by the audit consumer.
+    """
+    global _failed_login_script
+    redis = get_async_redis()
+    rate_keys = _login_rate_keys(email, ip_address)
+    try:
+        if success:
+            await redis.delete(rate_keys[0])
+        else:
+            if _failed_login_script is None:
+                _failed_login_script = redis.register_script(_FAILED_LOGIN_LUA)
+            await _failed_login_script(
+                keys=rate_keys,
+                args=[LOGIN_ATTEMPT_WINDOW_MINUTES * 60],
+            )
+        await redis.xadd(
+            AUDIT_STREAM_NAME,
+            {
+                "type": "login_attempt",
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "ip_address": ip_address or "",
+                "success": "1" if success else "0",
+                "timestamp": (now or utc_now()).isoformat(),
+            },
+            maxlen=AUDIT_STREAM_MAXLEN,
+            approximate=True,
+        )
+    except Exception as e:
+        logger.error(f"Failed to record login attempt: {e}")
+
+async def revoke_refresh_token(refresh_token: str, db: AsyncSession, commit: bool = True, user_id: str | None = None) -> bool:
+    """
+    Mark a refresh token as revoked (logout).
+    Returns False if no active token matched (unknown, or already revoked).
     
-    return False
+    One conditional UPDATE ... RETURNING: of two concurrent revokes of the
+    same token exactly one returns True. Pass user_id to only revoke a token
+    owned by that user, and commit=False to leave the update in the caller's
+    transaction.
+    """
+    stmt = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == _digest_token(refresh_token),
+            RefreshToken.is_revoked == False
+        )
+        .values(is_revoked=True)
+        .returning(RefreshToken.id)
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(RefreshToken.user_id == user_id)
+    result = await db.execute(stmt)
+    revoked = result.first() is not None
+    if revoked and commit:
+        await db.commit()
+    return revoked
 
-def revoke_all_user_tokens(user_id: str, db: Session):
-    """Revoke all refresh tokens for a user (forced logout from all devices)"""
-    db.query(RefreshToken).filter(
-        RefreshToken.user_id == user_id,
-        RefreshToken.is_revoked == False
-    ).update({"is_revoked": True})
-    db.commit()
+def revoke_all_user_tokens(user_id: str, db: Session, commit: bool = True) -> list[str]:
+    """
+    Revoke all refresh tokens for a user (forced logout from all devices).
+    
+    Returns the ids of the revoked tokens (UPDATE ... RETURNING, so callers
+    can audit how many sessions were killed without a second query).
+    """
+    result = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.is_revoked == False
+        )
+        .values(is_revoked=True)
+        .returning(RefreshToken.id)
+        .execution_options(synchronize_session=False)
+    )
+    revoked_ids = list(result.scalars())
+    if commit:
+        db.commit()
+    return revoked_ids
 
-def validate_refresh_token(refresh_token: str, db: Session) -> str | None:
+async def validate_refresh_token(refresh_token: str, db: AsyncSession, now: datetime | None = None) -> User | None:
     """
-    Validate a refresh token and return the user_id if valid.
+    Validate a refresh token and return its User if valid.
     Returns None if invalid or expired.
     
-    Must verify hashed token.
+    Single indexed lookup on the token digest, joined to the user.
     """
-    # Find all non-revoked, non-expired tokens
-    candidate_tokens = db.query(RefreshToken).filter(
-        RefreshToken.is_revoked == False,
-        RefreshToken.expires_at > datetime.utcnow()
-    ).all()
-    
-    # Check hash against candidates
-    for db_token in candidate_tokens:
-        if verify_password(refresh_token, db_token.token):
-            return db_token.user_id
-    
-    return None
+    token_hash = _digest_token(refresh_token)
+    result = await db.execute(
+        _ACTIVE_TOKEN_WITH_USER,
+        {"token_hash": token_hash, "now": now or utc_now()}
+    )
+    db_token = result.scalar_one_or_none()
+    # Constant-time re-check of the digest (no timing oracle on the comparison)
+    if not db_token or not hmac.compare_digest(bytes(db_token.token_hash), token_hash):
+        return None
+    return db_token.user
@@ -0,0 +1,27 @@
+# app/core/client_ip.py
+from fastapi import Request
+from app.config import TRUSTED_PROXY_COUNT
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    Resolve the real client IP once per request.
+
+    Behind TRUSTED_PROXY_COUNT reverse proxies that append to X-Forwarded-For
+    (nginx $proxy_add_x_forwarded_for, ALB), the client is the entry that many
+    hops from the right. Entries further left are client-supplied and must not
+    be trusted, or per-IP rate limits could be bypassed with a forged header.
+    RequestLoggingMiddleware stores the result on request.state.ip_address.
+    """
+    cached = getattr(request.state, "ip_address", None)
+    if cached:
+        return cached
+
+    if TRUSTED_PROXY_COUNT > 0:
+        x_forwarded_for = request.headers.get("x-forwarded-for")
+        if x_forwarded_for:
+            hops = x_forwarded_for.split(",")
+            return hops[max(len(hops) - TRUSTED_PROXY_COUNT, 0)].strip()
+
+    client = request.client
+    return client.host if client else "unknown"
@@ -1,12 +1,105 @@
+from uuid import uuid4
+import orjson
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.config import (
+    DATABASE_URL as _CONFIGURED_DATABASE_URL,
+    PGBOUNCER_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQL_ECHO,
+)
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# PgBouncer (transaction pooling) takes precedence when configured
+DATABASE_URL = PGBOUNCER_URL or _CONFIGURED_DATABASE_URL
+_IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
-engine = create_engine(DATABASE_URL, echo=True)
+# SQLite uses a SingletonThreadPool/NullPool and rejects QueuePool sizing
+_POOL_KWARGS = {} if _IS_SQLITE else {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": True,
+}
+
+
+def _json_serializer(value) -> str:
+    """orjson for JSON columns (audit metadata, etc.); int keys stringified like json.dumps."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# JSON/JSONB bind and result processing on both engines
+_JSON_KWARGS = {"json_serializer": _json_serializer, "json_deserializer": orjson.loads}
+
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, **_JSON_KWARGS, **_POOL_KWARGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Thread-local session registry for code that runs outside a request
+# (stream consumers, background services). Call db_session.remove() when done.
+db_session = scoped_session(SessionLocal)
+
+
+def get_db():
+    """
+    FastAPI dependency yielding the request's Session.
+
+    FastAPI caches dependency results per request, so every Depends(get_db)
+    in one request (route, get_current_user, require_role, ...) shares a
+    single Session and identity map.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+# Async engine for the auth hot path: frees the event loop during DB I/O
+# instead of pinning a threadpool worker per login.
+# Behind PgBouncer transaction pooling a prepared statement can outlive its
+# server connection: disable both asyncpg's statement cache and SQLAlchemy's
+# adapter cache, and give every prepared statement a unique name so a reused
+# server connection never sees "prepared statement already exists".
+_ASYNC_CONNECT_ARGS = {
+    "statement_cache_size": 0,
+    "prepared_statement_cache_size": 0,
+    "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+} if PGBOUNCER_URL else {}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=SQL_ECHO,
+    connect_args=_ASYNC_CONNECT_ARGS,
+    **_JSON_KWARGS,
+    **_POOL_KWARGS,
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    """FastAPI dependency yielding an AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
 def init_db():
     """Initialize database tables."""
@@ -17,5 +110,7 @@ def init_db():
 # Export Base for backward compatibility
 from app.models import Base
 
-__all__ = ["engine", "SessionLocal", "init_db", "Base"]
-
+__all__ = [
+    "engine", "SessionLocal", "db_session", "get_db", "init_db", "Base",
+    "async_engine", "AsyncSessionLocal", "get_async_db",
+]
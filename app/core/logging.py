@@ -5,18 +5,44 @@ Structured JSON logging for all SentinelIQ events
 
 import logging
 import sys
-import json
-from datetime import datetime
+import time
+import orjson
 from typing import Any, Dict, Optional
 from app.config import LOG_LEVEL
 
+# Optional structured fields copied from LogRecord attributes (via extra=...)
+_EXTRA_FIELDS = (
+    "user_id", "request_id", "ip_address", "method", "path",
+    "status_code", "duration_ms", "action", "target", "details",
+)
+_MISSING = object()
+# Non-str dict keys allowed like json.dumps; naive datetimes (utc_now()) are
+# tagged as UTC; other non-JSON values go through str
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+# (second, formatted prefix) of the last record; swapped as one tuple so
+# threads never see a prefix from a different second
+_last_second = (None, "")
+
+
+def _record_timestamp(record: logging.LogRecord) -> str:
+    """ISO-8601 UTC timestamp (ms precision) from the record's own creation time."""
+    global _last_second
+    second = int(record.created)
+    cached_second, prefix = _last_second
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _last_second = (second, prefix)
+    return "%s.%03d" % (prefix, record.msecs)
+
 
 class JSONFormatter(logging.Formatter):
     """Custom formatter that outputs logs as JSON for structured logging"""
     
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": _record_timestamp(record),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -26,32 +52,16 @@ class JSONFormatter(logging.Formatter):
         }
         
         # Add custom fields if present
-        if hasattr(record, "user_id"):
-            log_data["user_id"] = record.user_id
-        if hasattr(record, "request_id"):
-            log_data["request_id"] = record.request_id
-        if hasattr(record, "ip_address"):
-            log_data["ip_address"] = record.ip_address
-        if hasattr(record, "method"):
-            log_data["method"] = record.method
-        if hasattr(record, "path"):
-            log_data["path"] = record.path
-        if hasattr(record, "status_code"):
-            log_data["status_code"] = record.status_code
-        if hasattr(record, "duration_ms"):
-            log_data["duration_ms"] = record.duration_ms
-        if hasattr(record, "action"):
-            log_data["action"] = record.action
-        if hasattr(record, "target"):
-            log_data["target"] = record.target
-        if hasattr(record, "details"):
-            log_data["details"] = record.details
+        for field in _EXTRA_FIELDS:
+            value = getattr(record, field, _MISSING)
+            if value is not _MISSING:
+                log_data[field] = value
         
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, default=str, option=_ORJSON_OPTIONS).decode()
 
 
 def setup_logger(name: str) -> logging.Logger:
@@ -187,6 +197,11 @@ def log_api_event(
     error: Optional[str] = None
 ) -> None:
     """Log API request/response events"""
+    level = "INFO" if status_code < 400 else "WARNING" if status_code < 500 else "ERROR"
+    # Skip building the record entirely when the level is filtered out
+    if not logger.isEnabledFor(getattr(logging, level)):
+        return
+    
     details = {
         "method": method,
         "path": path,
@@ -196,8 +211,6 @@ def log_api_event(
     if error:
         details["error"] = error
     
-    level = "INFO" if status_code < 400 else "WARNING" if status_code < 500 else "ERROR"
-    
     log_event(
         action="api_request",
         user_id=user_id,
@@ -68,24 +68,38 @@ api_errors_total = Counter(
     registry=REGISTRY
 )
 
+graphql_rejected_queries = Counter(
+    "sentineliq_graphql_rejected_queries_total",
+    "GraphQL operations refused before execution",
+    ["reason"],  # cost
+    registry=REGISTRY
+)
+
 # === User Metrics ===
+# Gauges need an explicit multiprocess_mode under PROMETHEUS_MULTIPROC_DIR,
+# otherwise every worker exports its own pid-labelled series. Counts computed
+# from the database report the latest write; per-process values are summed
+# over live workers.
 active_users = Gauge(
     "sentineliq_active_users",
     "Number of active users",
     ["role"],  # admin, analyst, viewer
-    registry=REGISTRY
+    registry=REGISTRY,
+    multiprocess_mode="mostrecent"
 )
 
 users_online = Gauge(
     "sentineliq_users_online",
     "Number of users currently online",
-    registry=REGISTRY
+    registry=REGISTRY,
+    multiprocess_mode="mostrecent"
 )
 
 email_verified_users = Gauge(
     "sentineliq_email_verified_users",
     "Number of users with verified emails",
-    registry=REGISTRY
+    registry=REGISTRY,
+    multiprocess_mode="mostrecent"
 )
 
 # === Session Metrics ===
@@ -93,7 +107,8 @@ active_sessions = Gauge(
     "sentineliq_active_sessions",
     "Number of active sessions",
     ["user_role"],
-    registry=REGISTRY
+    registry=REGISTRY,
+    multiprocess_mode="mostrecent"
 )
 
 session_duration = Histogram(
@@ -122,7 +137,8 @@ email_sent_total = Counter(
 db_connection_pool_size = Gauge(
     "sentineliq_db_connection_pool_size",
     "Database connection pool size",
-    registry=REGISTRY
+    registry=REGISTRY,
+    multiprocess_mode="livesum"
 )
 
 db_query_duration = Histogram(
@@ -133,6 +149,30 @@ db_query_duration = Histogram(
 )
 
 
+# === Pre-bound label children ===
+# labels() validates, stringifies and hashes the label values and takes a
+# lock on every call; hot-path tracking incs/observes these children instead.
+_LOGIN_SUCCESS = auth_login_attempts.labels(status="success")
+_LOGIN_FAILED = auth_login_attempts.labels(status="failed")
+_LOGIN_LOCKED = auth_login_attempts.labels(status="locked")
+
+_REGISTRATION_SUCCESS = auth_registration_attempts.labels(status="success")
+_REGISTRATION_FAILED = auth_registration_attempts.labels(status="failed")
+
+_REFRESH_SUCCESS = auth_token_refreshes.labels(status="success")
+_REFRESH_FAILED = auth_token_refreshes.labels(status="failed")
+_REFRESH_EXPIRED = auth_token_refreshes.labels(status="expired")
+
+_EMAIL_VERIFICATION_SUCCESS = email_verification_attempts.labels(status="success")
+_EMAIL_VERIFICATION_FAILED = email_verification_attempts.labels(status="failed")
+_EMAIL_VERIFICATION_EXPIRED = email_verification_attempts.labels(status="expired")
+
+# Open-ended label values (roles, normalized endpoints): children bound on
+# first use and reused afterwards
+_RBAC_CHILDREN = {}
+_API_REQUEST_CHILDREN = {}
+
+
 class MetricsTracker:
     """Helper class for tracking metrics"""
     
@@ -140,31 +180,32 @@ class MetricsTracker:
     def track_login_attempt(success: bool, is_locked: bool = False) -> None:
         """Track login attempt"""
         if is_locked:
-            status = "locked"
+            _LOGIN_LOCKED.inc()
         else:
-            status = "success" if success else "failed"
-        auth_login_attempts.labels(status=status).inc()
+            (_LOGIN_SUCCESS if success else _LOGIN_FAILED).inc()
     
     @staticmethod
     def track_registration(success: bool) -> None:
         """Track registration attempt"""
-        status = "success" if success else "failed"
-        auth_registration_attempts.labels(status=status).inc()
+        (_REGISTRATION_SUCCESS if success else _REGISTRATION_FAILED).inc()
     
     @staticmethod
     def track_token_refresh(success: bool, expired: bool = False) -> None:
         """Track token refresh"""
         if expired:
-            status = "expired"
+            _REFRESH_EXPIRED.inc()
         else:
-            status = "success" if success else "failed"
-        auth_token_refreshes.labels(status=status).inc()
+            (_REFRESH_SUCCESS if success else _REFRESH_FAILED).inc()
     
     @staticmethod
     def track_rbac_check(allowed: bool, role: str) -> None:
         """Track RBAC access check"""
-        status = "allowed" if allowed else "denied"
-        rbac_access_checks.labels(status=status, role=role).inc()
+        key = (allowed, role)
+        child = _RBAC_CHILDREN.get(key)
+        if child is None:
+            status = "allowed" if allowed else "denied"
+            child = _RBAC_CHILDREN[key] = rbac_access_checks.labels(status=status, role=role)
+        child.inc()
     
     @staticmethod
     def track_forbidden_access(role: str, resource: str) -> None:
@@ -174,8 +215,16 @@ class MetricsTracker:
     @staticmethod
     def track_api_request(method: str, endpoint: str, status_code: int, duration: float) -> None:
         """Track API request"""
-        api_request_duration.labels(method=method, endpoint=endpoint, status_code=status_code).observe(duration)
-        api_requests_total.labels(method=method, endpoint=endpoint, status_code=status_code).inc()
+        key = (method, endpoint, status_code)
+        children = _API_REQUEST_CHILDREN.get(key)
+        if children is None:
+            children = _API_REQUEST_CHILDREN[key] = (
+                api_request_duration.labels(method=method, endpoint=endpoint, status_code=status_code),
+                api_requests_total.labels(method=method, endpoint=endpoint, status_code=status_code),
+            )
+        duration_child, total_child = children
+        duration_child.observe(duration)
+        total_child.inc()
     
     @staticmethod
     def track_api_error(method: str, endpoint: str, error_type: str) -> None:
@@ -186,10 +235,9 @@ class MetricsTracker:
     def track_email_verification(success: bool, expired: bool = False) -> None:
         """Track email verification attempt"""
         if expired:
-            status = "expired"
+            _EMAIL_VERIFICATION_EXPIRED.inc()
         else:
-            status = "success" if success else "failed"
-        email_verification_attempts.labels(status=status).inc()
+            (_EMAIL_VERIFICATION_SUCCESS if success else _EMAIL_VERIFICATION_FAILED).inc()
     
     @staticmethod
     def track_email_sent(email_type: str) -> None:
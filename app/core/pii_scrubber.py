@@ -2,7 +2,7 @@
 # Regex-based masking for sensitive data before logging
 
 import re
-import json
+import orjson
 from typing import Any, Dict, Union
 from functools import lru_cache
 
@@ -22,14 +22,17 @@ class PIIPatterns:
         r'\b\d{3}-\d{2}-\d{4}\b'
     )
     
-    # Email address
+    # Email address. The lookbehind only lets a match start at the beginning
+    # of a local-part run, so a long run with no "@" is scanned once instead
+    # of once per character (quadratic on crafted input).
     EMAIL = re.compile(
-        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+        r'(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
     )
     
-    # Phone number (US format)
+    # Phone number (US format). Must not start inside a longer word/digit run;
+    # the area code is either "(555)" or "555", never a half-open paren.
     PHONE = re.compile(
-        r'(?:\+?1)?[\s.-]?\(?[0-9]{3}\)?[\s.-]?[0-9]{3}[\s.-]?[0-9]{4}\b'
+        r'(?<![\w+])(?:\+?1[\s.-]?)?(?:\(\d{3}\)|\d{3})[\s.-]?\d{3}[\s.-]?\d{4}\b'
     )
     
     # Password fields (JSON: "password": "value")
@@ -83,6 +86,81 @@ class RedactionMasks:
     IBAN = "[REDACTED_IBAN]"
 
 
+# ========== COMBINED SCANNER ==========
+
+# (group name, pattern, mask) in precedence order: where two patterns match at
+# the same position, the earlier one wins.
+_PII_RULES = (
+    ("credit_card", PIIPatterns.CREDIT_CARD, RedactionMasks.CREDIT_CARD),
+    ("ssn", PIIPatterns.SSN, RedactionMasks.SSN),
+    ("email", PIIPatterns.EMAIL, RedactionMasks.EMAIL),
+    ("phone", PIIPatterns.PHONE, RedactionMasks.PHONE),
+    ("password", PIIPatterns.PASSWORD_JSON, '"password": "' + RedactionMasks.PASSWORD + '"'),
+    ("auth", PIIPatterns.AUTH_HEADER, RedactionMasks.AUTH),
+    ("account", PIIPatterns.ACCOUNT_NUMBER, RedactionMasks.ACCOUNT),
+    ("expiry", PIIPatterns.CARD_EXPIRY, RedactionMasks.EXPIRY),
+    ("cvv", PIIPatterns.CVV, RedactionMasks.CVV),
+    ("iban", PIIPatterns.IBAN, RedactionMasks.IBAN),
+)
+
+
+def _group(name: str, pattern: re.Pattern) -> str:
+    # Scoped inline flag keeps case-insensitivity per pattern (IBAN stays case-sensitive)
+    source = f"(?i:{pattern.pattern})" if pattern.flags & re.IGNORECASE else pattern.pattern
+    return f"(?P<{name}>{source})"
+
+
+_COMBINED_PII = re.compile("|".join(_group(name, pattern) for name, pattern, _ in _PII_RULES))
+_PII_MASKS = {name: mask for name, _, mask in _PII_RULES}
+
+
+def _mask_match(match: re.Match) -> str:
+    return _PII_MASKS[match.lastgroup]
+
+
+# Log lines and JSON leaves repeat constantly (paths, error details, enum
+# values). Short strings are memoized; long ones bypass the cache so
+# attacker-sized bodies can't pin memory (worst case ~4096 x 256 chars).
+_SCRUB_CACHE_MAX_LEN = 256
+
+
+@lru_cache(maxsize=4096)
+def _scrub_cached(text: str) -> str:
+    return _COMBINED_PII.sub(_mask_match, text)
+
+
+def _scrub_text(text: str) -> str:
+    if len(text) <= _SCRUB_CACHE_MAX_LEN:
+        return _scrub_cached(text)
+    return _COMBINED_PII.sub(_mask_match, text)
+
+
+# Field names whose values are always masked (substring match on the lowercased key)
+_SENSITIVE_KEY = re.compile(
+    'password|secret|token|api_key|credit_card|cvv|ssn|account|iban'
+)
+
+
+@lru_cache(maxsize=1024)
+def _is_sensitive_key(key: str) -> bool:
+    # JSON payloads repeat the same handful of keys; memoize the verdict
+    return _SENSITIVE_KEY.search(key.lower()) is not None
+
+
+def _scrub_node(value: Any, stack: list) -> Any:
+    """Scrub a leaf, or allocate an empty container and queue it for filling."""
+    if isinstance(value, str):
+        return _scrub_text(value)
+    if isinstance(value, dict):
+        copy = {}
+    elif isinstance(value, list):
+        copy = []
+    else:
+        return value
+    stack.append((value, copy))
+    return copy
+
+
 # ========== PII SCRUBBER ==========
 
 class PIIScrubber:
@@ -94,67 +172,35 @@ class PIIScrubber:
         if not isinstance(text, str):
             return text
         
-        # Credit card
-        text = PIIPatterns.CREDIT_CARD.sub(RedactionMasks.CREDIT_CARD, text)
-        
-        # SSN
-        text = PIIPatterns.SSN.sub(RedactionMasks.SSN, text)
-        
-        # Email
-        text = PIIPatterns.EMAIL.sub(RedactionMasks.EMAIL, text)
-        
-        # Phone
-        text = PIIPatterns.PHONE.sub(RedactionMasks.PHONE, text)
-        
-        # Password
-        text = PIIPatterns.PASSWORD_JSON.sub(
-            r'"password": "' + RedactionMasks.PASSWORD + '"',
-            text
-        )
-        
-        # Auth headers
-        text = PIIPatterns.AUTH_HEADER.sub(RedactionMasks.AUTH, text)
-        
-        # Account number
-        text = PIIPatterns.ACCOUNT_NUMBER.sub(RedactionMasks.ACCOUNT, text)
-        
-        # Card expiry
-        text = PIIPatterns.CARD_EXPIRY.sub(RedactionMasks.EXPIRY, text)
-        
-        # CVV
-        text = PIIPatterns.CVV.sub(RedactionMasks.CVV, text)
-        
-        # IBAN
-        text = PIIPatterns.IBAN.sub(RedactionMasks.IBAN, text)
-        
-        return text
+        # One pass over the text; the matched group picks the mask
+        return _scrub_text(text)
     
     @staticmethod
     def scrub_json(obj: Union[dict, list, str]) -> Union[dict, list, str]:
         """
-        Recursively scrub PII from JSON objects.
-        Handles nested structures (dicts, lists).
+        Scrub PII from JSON objects, returning a scrubbed copy.
+        Handles nested structures (dicts, lists) with an explicit stack
+        instead of recursion; the input is never mutated.
         """
         if isinstance(obj, str):
             return PIIScrubber.scrub_string(obj)
-        
-        elif isinstance(obj, dict):
-            scrubbed = {}
-            for key, value in obj.items():
-                # Scrub sensitive field names
-                if any(sensitive in key.lower() for sensitive in 
-                       ['password', 'secret', 'token', 'api_key', 'credit_card', 
-                        'cvv', 'ssn', 'account', 'iban']):
-                    scrubbed[key] = RedactionMasks.PASSWORD
-                else:
-                    scrubbed[key] = PIIScrubber.scrub_json(value)
-            return scrubbed
-        
-        elif isinstance(obj, list):
-            return [PIIScrubber.scrub_json(item) for item in obj]
-        
-        else:
+        if not isinstance(obj, (dict, list)):
             return obj
+        
+        stack = []
+        root = _scrub_node(obj, stack)
+        while stack:
+            source, target = stack.pop()
+            if isinstance(source, dict):
+                for key, value in source.items():
+                    # Scrub sensitive field names
+                    if isinstance(key, str) and _is_sensitive_key(key):
+                        target[key] = RedactionMasks.PASSWORD
+                    else:
+                        target[key] = _scrub_node(value, stack)
+            else:
+                target.extend(_scrub_node(item, stack) for item in source)
+        return root
     
     @staticmethod
     def scrub_dict(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -181,10 +227,22 @@ def log_safe(data: Union[str, dict, list]) -> Union[str, dict, list]:
 
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
+import io
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cheap byte-level prefilter: every PII pattern needs an "@", two adjacent
+# digits, or one of these keywords (which also cover scrub_json's sensitive
+# keys). Bodies with none of them are logged without parsing or scrubbing.
+_PII_HINT = re.compile(
+    rb'@|\d\d|(?i:pass|pwd|secret|token|api_key|bearer|basic|account|acct|credit|cvv|cvc|cid|ssn|iban)'
+)
+_UNSCRUBBED_LOG_LIMIT = 512
+# Error-response bytes kept for logging (the client still gets the full body)
+_RESPONSE_LOG_LIMIT = 16 * 1024
+
 
 class PIIScrubbingMiddleware(BaseHTTPMiddleware):
     """
@@ -192,15 +250,25 @@ class PIIScrubbingMiddleware(BaseHTTPMiddleware):
     """
     
     async def dispatch(self, request: Request, call_next):
+        # Everything below only feeds DEBUG lines; don't read/scrub bodies for
+        # log records that would be discarded anyway
+        if not logger.isEnabledFor(logging.DEBUG):
+            return await call_next(request)
+        
         # Log request (scrubbed)
         try:
             body = await request.body()
-            if body:
+            if body and not _PII_HINT.search(body):
+                logger.debug(
+                    f"[REQUEST] {request.method} {request.url.path}: "
+                    f"{body[:_UNSCRUBBED_LOG_LIMIT].decode('utf-8', errors='ignore')}"
+                )
+            elif body:
                 try:
-                    request_data = json.loads(body)
+                    request_data = orjson.loads(body)
                     scrubbed_request = PIIScrubber.scrub_json(request_data)
                     logger.debug(f"[REQUEST] {request.method} {request.url.path}: {scrubbed_request}")
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     # Not JSON, scrub as string
                     scrubbed_body = PIIScrubber.scrub_string(body.decode('utf-8', errors='ignore'))
                     logger.debug(f"[REQUEST] {request.method} {request.url.path}: {scrubbed_body}")
@@ -210,24 +278,40 @@ class PIIScrubbingMiddleware(BaseHTTPMiddleware):
         # Call next middleware
         response = await call_next(request)
         
-        # Log response (scrubbed) - for error responses only
+        # Log response (scrubbed) - for error responses only. The body is
+        # streamed through to the client untouched; only a capped prefix is
+        # kept for the log line.
         if response.status_code >= 400:
-            try:
-                body = b""
-                async for chunk in response.body_iterator:
-                    body += chunk
-                if body:
-                    try:
-                        response_data = json.loads(body)
-                        scrubbed_response = PIIScrubber.scrub_json(response_data)
-                        logger.debug(f"[RESPONSE] {response.status_code}: {scrubbed_response}")
-                    except json.JSONDecodeError:
-                        scrubbed_body = PIIScrubber.scrub_string(body.decode('utf-8', errors='ignore'))
-                        logger.debug(f"[RESPONSE] {response.status_code}: {scrubbed_body}")
-            except Exception as e:
-                logger.debug(f"[RESPONSE] Could not scrub response body: {e}")
+            return StreamingResponse(
+                self._tee_error_body(response),
+                status_code=response.status_code,
+                headers=response.headers,
+                background=response.background,
+            )
         
         return response
+    
+    @staticmethod
+    async def _tee_error_body(response):
+        captured = io.BytesIO()
+        async for chunk in response.body_iterator:
+            if captured.tell() < _RESPONSE_LOG_LIMIT:
+                captured.write(chunk[:_RESPONSE_LOG_LIMIT - captured.tell()])
+            yield chunk
+        
+        body = captured.getvalue()
+        if not body:
+            return
+        try:
+            try:
+                response_data = orjson.loads(body)
+                scrubbed_response = PIIScrubber.scrub_json(response_data)
+                logger.debug(f"[RESPONSE] {response.status_code}: {scrubbed_response}")
+            except orjson.JSONDecodeError:
+                scrubbed_body = PIIScrubber.scrub_string(body.decode('utf-8', errors='ignore'))
+                logger.debug(f"[RESPONSE] {response.status_code}: {scrubbed_body}")
+        except Exception as e:
+            logger.debug(f"[RESPONSE] Could not scrub response body: {e}")
 
 
 # ========== TESTING HELPERS ==========
@@ -10,24 +10,70 @@ Features:
 - Redis-backed for distributed systems
 """
 
+import inspect
+import itertools
+import os
 import time
 import logging
-from typing import Tuple, Optional
+from typing import Tuple, Optional, get_type_hints
 from functools import wraps
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
 
-from app.services.redis_stream import get_redis_stream_manager
+from app.services.redis_stream import get_async_redis, get_redis_stream_manager
+from app.core.client_ip import get_client_ip
 
 logger = logging.getLogger("sentineliq.rate_limiter")
 
+# Trim + count + conditional add + expire as one atomic step: one round trip,
+# and concurrent requests can't all pass the count check before any ZADD.
+# Scores are the Redis server's clock (integer µs), so every worker and host
+# shares one time base and an NTP step on an app host can't push entries into
+# the future or expire them early.
+# Expired entries are only trimmed once the key is at least half full: below
+# that even the untrimmed count is under the limit, so the answer is the same
+# and the common path is a single O(1) ZCARD. (Stale entries can make
+# "remaining" conservative while the key is under half full.)
+# KEYS[1] = window key; ARGV = window_size (s), max_requests, member
+# Returns {allowed (1/0), requests in window including this one if allowed}
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local count = redis.call('ZCARD', key)
+if count * 2 >= limit then
+    count = count - redis.call('ZREMRANGEBYSCORE', key, 0, now - window * 1000000)
+end
+if count >= limit then
+    return {0, count}
+end
+redis.call('ZADD', key, now, ARGV[3])
+redis.call('EXPIRE', key, window + 1)
+return {1, count + 1}
+"""
+
+# ZSET members must be unique per request: two requests in the same
+# microsecond (or from two workers) would otherwise collapse into one entry
+# and be under-counted. Member = "<process tag>:<per-process sequence>".
+_PROCESS_TAG = os.urandom(2).hex()
+_member_seq = itertools.count()
+
 
 class RateLimiter:
     """Sliding window rate limiter using Redis."""
     
     def __init__(self, redis_manager=None):
         self.redis = redis_manager or get_redis_stream_manager()
+        # Shared client (and its connection pool), bound once
+        self._r = self.redis.get_redis()
         self.default_window_size = 60  # seconds
         self.default_max_requests = 100  # requests per window
+        # EVALSHA with automatic SCRIPT LOAD on NOSCRIPT (no round trip here)
+        self._sliding_window = self._r.register_script(_SLIDING_WINDOW_LUA)
+        # Same script on the asyncio client, for checks made on the event loop
+        self._async_sliding_window = get_async_redis().register_script(_SLIDING_WINDOW_LUA)
     
     def get_key(self, identifier: str, endpoint: str, window_type: str = "user") -> str:
         """Generate rate limit key for Redis."""
@@ -58,61 +104,81 @@ class RateLimiter:
         window_size = window_size or self.default_window_size
         
         key = self.get_key(identifier, endpoint, window_type)
-        current_time = time.time()
-        window_start = current_time - window_size
+        member = f"{_PROCESS_TAG}:{next(_member_seq)}"
         
         try:
-            # Get Redis connection
-            r = self.redis.get_redis()
-            
-            # Remove expired entries (older than window)
-            r.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests in window
-            request_count = r.zcard(key)
-            
-            # Get remaining requests
-            remaining = max(0, max_requests - request_count)
-            
-            # Build response info
-            info = {
-                "limit": max_requests,
-                "remaining": remaining,
-                "reset_at": int(current_time + window_size),
-                "window_size": window_size
-            }
-            
-            # If at limit, reject
-            if request_count >= max_requests:
-                logger.warning(
-                    f"Rate limit exceeded for {window_type}={identifier} on {endpoint}",
-                    extra={
-                        "identifier": identifier,
-                        "endpoint": endpoint,
-                        "current_count": request_count,
-                        "limit": max_requests
-                    }
-                )
-                return False, info
-            
-            # Add current request to window
-            r.zadd(key, {str(current_time): current_time})
-            r.expire(key, window_size + 1)  # Auto-expire after window
-            
-            info["remaining"] = remaining - 1  # Account for this request
-            return True, info
-            
+            allowed, request_count = self._sliding_window(
+                keys=[key],
+                args=[window_size, max_requests, member]
+            )
         except Exception as e:
-            logger.error(f"Rate limiter error: {str(e)}", extra={"error": str(e)})
-            # Fail open on Redis errors (don't block requests if Redis down)
-            return True, {"error": "rate_limiter_unavailable"}
+            return self._unavailable(e)
+        return self._result(allowed, request_count, identifier, endpoint, max_requests, window_size, window_type)
+    
+    async def is_allowed_async(
+        self,
+        identifier: str,
+        endpoint: str,
+        max_requests: int = None,
+        window_size: int = None,
+        window_type: str = "user"
+    ) -> Tuple[bool, dict]:
+        """
+        is_allowed for code running on the event loop: the check goes through
+        the asyncio Redis client, so a slow Redis never blocks the loop.
+        """
+        max_requests = max_requests or self.default_max_requests
+        window_size = window_size or self.default_window_size
+        
+        key = self.get_key(identifier, endpoint, window_type)
+        member = f"{_PROCESS_TAG}:{next(_member_seq)}"
+        
+        try:
+            allowed, request_count = await self._async_sliding_window(
+                keys=[key],
+                args=[window_size, max_requests, member]
+            )
+        except Exception as e:
+            return self._unavailable(e)
+        return self._result(allowed, request_count, identifier, endpoint, max_requests, window_size, window_type)
+    
+    @staticmethod
+    def _result(allowed, request_count, identifier, endpoint, max_requests, window_size, window_type) -> Tuple[bool, dict]:
+        # Build response info
+        info = {
+            "limit": max_requests,
+            "remaining": max(0, max_requests - request_count),
+            # User-facing header: local wall clock is fine here
+            "reset_at": int(time.time()) + window_size,
+            "window_size": window_size
+        }
+        
+        # If at limit, reject
+        if not allowed:
+            logger.warning(
+                f"Rate limit exceeded for {window_type}={identifier} on {endpoint}",
+                extra={
+                    "identifier": identifier,
+                    "endpoint": endpoint,
+                    "current_count": request_count,
+                    "limit": max_requests
+                }
+            )
+            return False, info
+        
+        return True, info
+    
+    @staticmethod
+    def _unavailable(e: Exception) -> Tuple[bool, dict]:
+        logger.error(f"Rate limiter error: {str(e)}", extra={"error": str(e)})
+        # Fail open on Redis errors (don't block requests if Redis down)
+        return True, {"error": "rate_limiter_unavailable"}
     
     def reset_limit(self, identifier: str, endpoint: str, window_type: str = "user") -> bool:
         """Reset rate limit for a specific identifier (e.g., after account unlock)."""
         try:
             key = self.get_key(identifier, endpoint, window_type)
-            r = self.redis.get_redis()
-            r.delete(key)
+            self._r.delete(key)
             logger.info(f"Reset rate limit for {window_type}={identifier} on {endpoint}")
             return True
         except Exception as e:
@@ -123,9 +189,11 @@ class RateLimiter:
         """Get current rate limit status for an identifier."""
         try:
             key = self.get_key(identifier, endpoint, window_type)
-            r = self.redis.get_redis()
-            ttl = r.ttl(key)
-            count = r.zcard(key)
+            # Both reads in one round trip
+            pipe = self._r.pipeline(transaction=False)
+            pipe.ttl(key)
+            pipe.zcard(key)
+            ttl, count = pipe.execute()
             
             if count == 0:
                 return None
@@ -139,7 +207,7 @@ class RateLimiter:
             return None
 
 
-# Global rate limiter instance
+# Global rate limiter instances
 _rate_limiter = None
 
 
@@ -166,39 +234,45 @@ def rate_limit(
         by: "user", "ip", or "endpoint"
         endpoint: Custom endpoint name (auto-detected if None)
     
+    The decorated endpoint must declare a `Request` parameter.
+    
     Example:
         @app.post("/auth/login")
         @rate_limit(max_requests=5, window_size=60, by="ip")
-        def login(creds: LoginRequest):
+        def login(creds: LoginRequest, request: Request):
             ...
     """
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            # Extract identifier and request
-            from fastapi import Request
-            request = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
-            
-            if not request:
-                return await func(*args, **kwargs)
-            
-            # Determine identifier based on 'by' parameter
-            if by == "ip":
-                identifier = request.client.host if request.client else "unknown"
-            elif by == "user":
-                # Try to get user from request state
-                identifier = getattr(request.state, "user_id", None) or request.client.host
-            else:
-                identifier = request.client.host
+        # Locate the Request parameter once, not by scanning args per call.
+        # FastAPI passes endpoint parameters as keywords, so look there first.
+        # get_type_hints resolves string / `from __future__ import annotations`
+        # annotations; issubclass accepts Request subclasses.
+        hints = get_type_hints(func)
+        params = list(inspect.signature(func).parameters)
+        req_name = next(
+            (name for name in params if isinstance(hints.get(name), type) and issubclass(hints[name], Request)),
+            None
+        )
+        if req_name is None:
+            raise TypeError(f"@rate_limit on {func.__qualname__} requires a `Request` parameter")
+        req_index = params.index(req_name)
+        
+        # Identifier extractor chosen once from `by`
+        if by == "user":
+            # User id from request state when auth populated it, else client IP
+            get_identifier = lambda request: getattr(request.state, "user_id", None) or get_client_ip(request)
+        else:
+            get_identifier = get_client_ip
+        
+        async def enforce(args, kwargs):
+            request = kwargs.get(req_name)
+            if request is None:
+                request = args[req_index]
             
             ep = endpoint or request.url.path
-            limiter = get_rate_limiter()
-            allowed, info = limiter.is_allowed(
-                identifier=identifier,
+            # Runs on the event loop for sync and async endpoints alike
+            allowed, info = await get_rate_limiter().is_allowed_async(
+                identifier=get_identifier(request),
                 endpoint=ep,
                 max_requests=max_requests,
                 window_size=window_size,
@@ -218,59 +292,20 @@ def rate_limit(
             
             # Store rate limit info in request state
             request.state.rate_limit_info = info
-            
-            return await func(*args, **kwargs)
         
+        is_async = inspect.iscoroutinefunction(func)
+        
+        # One async wrapper for both kinds: FastAPI awaits it on the event
+        # loop (the limit check is async Redis), and a sync endpoint still
+        # runs in the threadpool as it would undecorated.
         @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            # Extract identifier and request
-            from fastapi import Request
-            request = None
-            for arg in args:
-                if isinstance(arg, Request):
-                    request = arg
-                    break
-            
-            if not request:
-                return func(*args, **kwargs)
-            
-            # Determine identifier
-            if by == "ip":
-                identifier = request.client.host if request.client else "unknown"
-            elif by == "user":
-                identifier = getattr(request.state, "user_id", None) or request.client.host
-            else:
-                identifier = request.client.host
-            
-            ep = endpoint or request.url.path
-            limiter = get_rate_limiter()
-            allowed, info = limiter.is_allowed(
-                identifier=identifier,
-                endpoint=ep,
-                max_requests=max_requests,
-                window_size=window_size,
-                window_type=by
-            )
-            
-            if not allowed:
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Rate limit exceeded",
-                    headers={
-                        "X-RateLimit-Limit": str(info["limit"]),
-                        "X-RateLimit-Remaining": str(info["remaining"]),
-                        "X-RateLimit-Reset": str(info["reset_at"])
-                    }
-                )
-            
-            request.state.rate_limit_info = info
-            return func(*args, **kwargs)
+        async def wrapper(*args, **kwargs):
+            await enforce(args, kwargs)
+            if is_async:
+                return await func(*args, **kwargs)
+            return await run_in_threadpool(func, *args, **kwargs)
         
-        # Use async wrapper if function is async, else sync
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return wrapper
     
     return decorator
 
@@ -284,5 +319,3 @@ RATE_LIMITS = {
     "api_burst": {"max_requests": 10, "window_size": 10},      # 10 per 10 seconds
 }
 
-
-import asyncio
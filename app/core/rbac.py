@@ -1,12 +1,14 @@
 # RBAC Authorization System for SentinelIQ
 
 from enum import Enum
-from typing import Dict, List, Set
+from functools import reduce
+from operator import or_
+from typing import Dict, FrozenSet, List, Set
 from functools import wraps
 from fastapi import HTTPException, status, Depends
 from sqlalchemy.orm import Session
 from app.models import User
-from app.database import get_db
+from app.core.db import get_db
 
 # ========== ROLE DEFINITIONS ==========
 
@@ -129,6 +131,29 @@ ROLE_PERMISSIONS: Dict[Role, Set[Permission]] = {
 }
 
 
+# Lookups keyed by the raw user.role string, built once at import: no Role(...)
+# construction per check, and unknown role strings simply get no permissions
+# (Role(...) raised ValueError on them).
+_NO_PERMISSIONS: FrozenSet = frozenset()
+_PERMISSIONS_BY_ROLE: Dict[str, FrozenSet[Permission]] = {
+    role.value: frozenset(perms) for role, perms in ROLE_PERMISSIONS.items()
+}
+
+# One bit per Permission; a role's permissions are the OR of their bits, so a
+# check is a single AND and "any of" several permissions is one mask test.
+# Permission is a str Enum, so the raw value string finds the same bit.
+_PERMISSION_BIT: Dict[Permission, int] = {perm: 1 << i for i, perm in enumerate(Permission)}
+_PERMISSION_MASK_BY_ROLE: Dict[str, int] = {
+    role.value: reduce(or_, (_PERMISSION_BIT[p] for p in perms), 0)
+    for role, perms in ROLE_PERMISSIONS.items()
+}
+
+
+def permission_mask(*permissions: Permission) -> int:
+    """Combined bit mask for the given permissions."""
+    return reduce(or_, (_PERMISSION_BIT[p] for p in permissions), 0)
+
+
 # ========== RESOURCE-LEVEL PERMISSIONS ==========
 
 def has_organization_access(user: User, org_id: str) -> bool:
@@ -154,15 +179,16 @@ def can_access_org_data(user: User, target_org_id: str) -> bool:
 
 def require_permission(permission: Permission):
     """Decorator: Require specific permission."""
+    required = _PERMISSION_BIT[permission]
+    detail = f"Missing required permission: {permission.value}"
+    
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, current_user: User = Depends(), **kwargs):
-            user_permissions = ROLE_PERMISSIONS.get(Role(current_user.role), set())
-            
-            if permission not in user_permissions:
+            if not _PERMISSION_MASK_BY_ROLE.get(current_user.role, 0) & required:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Missing required permission: {permission.value}"
+                    detail=detail
                 )
             
             return await func(*args, current_user=current_user, **kwargs)
@@ -173,13 +199,16 @@ def require_permission(permission: Permission):
 
 def require_role(*allowed_roles: Role):
     """Decorator: Require one of specified roles."""
+    allowed = frozenset(r.value for r in allowed_roles)
+    detail = f"Access denied. Required roles: {', '.join([r.value for r in allowed_roles])}"
+    
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, current_user: User = Depends(), **kwargs):
-            if Role(current_user.role) not in allowed_roles:
+            if current_user.role not in allowed:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Access denied. Required roles: {', '.join([r.value for r in allowed_roles])}"
+                    detail=detail
                 )
             
             return await func(*args, current_user=current_user, **kwargs)
@@ -209,8 +238,12 @@ def require_org_access(func):
 
 def check_permission(user: User, permission: Permission) -> bool:
     """Check if user has a specific permission."""
-    user_permissions = ROLE_PERMISSIONS.get(Role(user.role), set())
-    return permission in user_permissions
+    return bool(_PERMISSION_MASK_BY_ROLE.get(user.role, 0) & _PERMISSION_BIT[permission])
+
+
+def check_any_permission(user: User, mask: int) -> bool:
+    """Check if user has any permission in a mask built by permission_mask()."""
+    return bool(_PERMISSION_MASK_BY_ROLE.get(user.role, 0) & mask)
 
 
 def check_role(user: User, role: Role) -> bool:
@@ -218,9 +251,9 @@ def check_role(user: User, role: Role) -> bool:
     return user.role == role.value
 
 
-def get_user_permissions(user: User) -> Set[Permission]:
-    """Get all permissions for a user."""
-    return ROLE_PERMISSIONS.get(Role(user.role), set())
+def get_user_permissions(user: User) -> FrozenSet[Permission]:
+    """Get all permissions for a user (shared, immutable)."""
+    return _PERMISSIONS_BY_ROLE.get(user.role, _NO_PERMISSIONS)
 
 
 # ========== RESOURCE ACCESS CONTROL ==========
@@ -233,34 +266,34 @@ class ResourceACL:
         """Can user view an event?"""
         if not has_organization_access(user, event_org_id):
             return False
-        return Permission.EVENT_READ in get_user_permissions(user)
+        return check_permission(user, Permission.EVENT_READ)
     
     @staticmethod
     def can_create_case(user: User, org_id: str) -> bool:
         """Can user create a case?"""
         if not has_organization_access(user, org_id):
             return False
-        return Permission.CASE_WRITE in get_user_permissions(user)
+        return check_permission(user, Permission.CASE_WRITE)
     
     @staticmethod
     def can_access_shadow_rules(user: User) -> bool:
         """Can user access shadow mode rules?"""
-        return Permission.RULE_SHADOW in get_user_permissions(user)
+        return check_permission(user, Permission.RULE_SHADOW)
     
     @staticmethod
     def can_export_audit_logs(user: User) -> bool:
         """Can user export audit logs?"""
-        return Permission.AUDIT_EXPORT in get_user_permissions(user)
+        return check_permission(user, Permission.AUDIT_EXPORT)
     
     @staticmethod
     def can_modify_rules(user: User) -> bool:
         """Can user modify rules?"""
-        return Permission.RULE_WRITE in get_user_permissions(user)
+        return check_permission(user, Permission.RULE_WRITE)
     
     @staticmethod
     def can_create_incident(user: User) -> bool:
         """Can user create incidents?"""
-        return Permission.INCIDENT_WRITE in get_user_permissions(user)
+        return check_permission(user, Permission.INCIDENT_WRITE)
 
 
 # ========== ROLE INFORMATION ==========
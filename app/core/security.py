@@ -1,26 +1,87 @@
 from datetime import datetime, timedelta
-from jose import jwt
-from passlib.context import CryptContext
+import jwt
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 import secrets
-from app.config import ALGORITHM, SECRET_KEY, REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import ALGORITHM, SECRET_KEY, REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES, ROLE_CODES, ROLE_BY_CODE
 
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
+# Cost pinned so hashes don't drift with library defaults
+BCRYPT_ROUNDS = 12
+# bcrypt only reads the first 72 bytes; truncate explicitly (as passlib did)
+# rather than depend on the library version's handling of longer input
+_BCRYPT_MAX_BYTES = 72
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    """bcrypt hash ($2b$) of password."""
+    return bcrypt.hashpw(
+        password.encode("utf-8")[:_BCRYPT_MAX_BYTES],
+        bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    ).decode("ascii")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    """Check password against a bcrypt hash; malformed hashes never match."""
+    try:
+        return bcrypt.checkpw(
+            plain_password.encode("utf-8")[:_BCRYPT_MAX_BYTES],
+            hashed_password.encode("ascii")
+        )
+    except ValueError:
+        return False
+
+# Verified against when the user doesn't exist so unknown emails cost the same
+# bcrypt work as known ones (no timing oracle for account enumeration).
+DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+# bcrypt releases the GIL, so a pool sized to the cores hashes in parallel
+# without blocking the event loop.
+bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_pool, hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_pool, verify_password, plain_password, hashed_password)
+
+# HMAC key bytes encoded once instead of per sign/verify
+_JWT_KEY = SECRET_KEY.encode()
+# Decoder bound once: algorithm allow-list and options aren't rebuilt per call,
+# and a token without exp is rejected rather than treated as never-expiring
+_JWT_ALGORITHMS = [ALGORITHM]
+_jwt_decoder = jwt.PyJWT(options={"require": ["exp"]})
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM)
+
+def decode_access_token(token: str) -> dict:
+    """Verify signature/expiry and return the claims; raises jwt.PyJWTError."""
+    return _jwt_decoder.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
+
+# Access token claim schema version (bump when claim names/encodings change)
+ACCESS_TOKEN_VERSION = 1
+
+def access_token_claims(user_id: str, role: str) -> dict:
+    """
+    Compact claims: s=subject, r=role code (role name if it has no code),
+    v=claim schema version.
+    """
+    return {"s": user_id, "r": ROLE_CODES.get(role, role), "v": ACCESS_TOKEN_VERSION}
+
+def claims_subject(payload: dict) -> str | None:
+    """User id from compact ("s") or legacy ("sub") claims."""
+    return payload.get("s") or payload.get("sub")
+
+def claims_role(payload: dict) -> str | None:
+    """Role name from compact ("r") or legacy ("role") claims."""
+    if "r" in payload:
+        return ROLE_BY_CODE.get(payload["r"], payload["r"])
+    return payload.get("role")
 
 def create_refresh_token() -> str:
     """Generate a secure refresh token"""
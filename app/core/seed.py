@@ -1,16 +1,14 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from app.models import Organization
 from app.core.constants import DEFAULT_ORG_ID, DEFAULT_ORG_NAME
 
-def seed_default_org(db: Session):
-    org = db.query(Organization).filter(
-        Organization.id == DEFAULT_ORG_ID
-    ).first()
+# Idempotent and race-free: workers booting together can't trip a duplicate key
+_SEED_DEFAULT_ORG = pg_insert(Organization).values(
+    id=DEFAULT_ORG_ID,
+    name=DEFAULT_ORG_NAME
+).on_conflict_do_nothing(index_elements=[Organization.id])
 
-    if not org:
-        org = Organization(
-            id=DEFAULT_ORG_ID,
-            name=DEFAULT_ORG_NAME
-        )
-        db.add(org)
-        db.commit()
+def seed_default_org(db: Session):
+    db.execute(_SEED_DEFAULT_ORG)
+    db.commit()
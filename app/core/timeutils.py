@@ -0,0 +1,13 @@
+# app/core/timeutils.py
+from datetime import datetime, timezone
+
+
+def utc_now() -> datetime:
+    """
+    Current UTC time as a naive datetime.
+
+    Non-deprecated replacement for datetime.utcnow(). The tzinfo is dropped
+    because every DateTime column is "timestamp without time zone" (asyncpg
+    rejects aware values there). Call once per request and reuse the value.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -1,22 +1,121 @@
 # app/dependencies.py
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
+from redis.exceptions import RedisError
+from sqlalchemy import select, bindparam
 from sqlalchemy.orm import Session
-from app.models import User, AuditLog
-from app.core.db import SessionLocal
-from app.config import SECRET_KEY, ALGORITHM
-import uuid
-from datetime import datetime
+from app.models import User
+from app.core.db import get_db
+from app.core.security import decode_access_token, claims_subject
+from app.services.audit_stream import audit_log
+from app.services.redis_stream import get_async_redis, get_redis_stream_manager
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_db():
-    db = SessionLocal()
+logger = logging.getLogger("sentineliq.auth")
+
+# Hot path: only an active, verified user comes back; anything else is 0 rows
+_AUTHORIZED_USER = select(User).where(
+    User.id == bindparam("user_id"),
+    User.is_active == True,
+    User.email_verified == True
+)
+# Rejection path only: tells "unknown" / "disabled" / "unverified" apart
+_USER_STATUS = select(User.is_active, User.email_verified).where(User.id == bindparam("user_id"))
+
+# Per-process cache of bearer token -> the authorized user's column values,
+# so a token presented repeatedly skips the JWT HMAC and the user SELECT.
+# Only immutable primitives are cached; every request gets its own transient
+# User built from them, so no ORM instance is shared between requests.
+# Entries live until the token's exp or TOKEN_USER_CACHE_TTL_SECONDS,
+# whichever is sooner.
+#
+# Revocation reaches every worker through a per-user auth epoch in Redis:
+# forget_cached_user() bumps it, and a hit is honoured only while the epoch
+# still matches the one read before the user was loaded. If Redis can't be
+# read, the hit is dropped and the user comes from the database.
+TOKEN_USER_CACHE_TTL_SECONDS = 30
+TOKEN_USER_CACHE_MAX_ENTRIES = 4096
+_CACHED_USER_FIELDS = (
+    "id", "org_id", "first_name", "last_name", "email", "role",
+    "risk_score", "is_active", "email_verified", "created_at", "updated_at",
+)
+_token_user_cache: "OrderedDict[bytes, tuple[float, str | None, tuple]]" = OrderedDict()
+_token_user_cache_lock = threading.Lock()
+# Epochs are random (not a counter), so a key that expired and was set again
+# can't repeat an old value; it only has to outlive entries cached before it.
+_AUTH_EPOCH_TTL_SECONDS = 2 * TOKEN_USER_CACHE_TTL_SECONDS
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def _auth_epoch_key(user_id: str) -> str:
+    return f"auth:epoch:{user_id}"
+
+def _read_auth_epoch(user_id: str) -> str | None:
+    """User's auth epoch (None until first revoked); raises RedisError."""
+    return get_redis_stream_manager().redis.get(_auth_epoch_key(user_id))
+
+def _get_cached_user(key: bytes, now: float) -> User | None:
+    with _token_user_cache_lock:
+        entry = _token_user_cache.get(key)
+        if entry is None:
+            return None
+        deadline, epoch, values = entry
+        if deadline <= now:
+            del _token_user_cache[key]
+            return None
+        _token_user_cache.move_to_end(key)
+    
+    try:
+        current_epoch = _read_auth_epoch(values[0])
+    except RedisError:
+        return None
+    if current_epoch != epoch:
+        with _token_user_cache_lock:
+            _token_user_cache.pop(key, None)
+        return None
+    return User(**dict(zip(_CACHED_USER_FIELDS, values)))
+
+def _cache_user(key: bytes, user: User, epoch: str | None, deadline: float):
+    values = tuple(getattr(user, field) for field in _CACHED_USER_FIELDS)
+    with _token_user_cache_lock:
+        _token_user_cache[key] = (deadline, epoch, values)
+        _token_user_cache.move_to_end(key)
+        if len(_token_user_cache) > TOKEN_USER_CACHE_MAX_ENTRIES:
+            _token_user_cache.popitem(last=False)
+
+def _forget_local(user_id: str):
+    with _token_user_cache_lock:
+        stale = [key for key, (_, _, values) in _token_user_cache.items() if values[0] == user_id]
+        for key in stale:
+            del _token_user_cache[key]
+
+def forget_cached_user(user_id: str):
+    """
+    Invalidate cached tokens for user_id in every worker (after disable, role
+    change, password reset or logout-all).
+    """
+    _forget_local(user_id)
+    try:
+        get_redis_stream_manager().redis.set(_auth_epoch_key(user_id), uuid.uuid4().hex, ex=_AUTH_EPOCH_TTL_SECONDS)
+    except RedisError as e:
+        logger.error(f"Auth epoch bump failed for {user_id}: {e}")
+
+async def forget_cached_user_async(user_id: str):
+    """forget_cached_user for async handlers."""
+    _forget_local(user_id)
     try:
-        yield db
-    finally:
-        db.close()
+        await get_async_redis().set(_auth_epoch_key(user_id), uuid.uuid4().hex, ex=_AUTH_EPOCH_TTL_SECONDS)
+    except RedisError as e:
+        logger.error(f"Auth epoch bump failed for {user_id}: {e}")
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -24,50 +123,72 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cache_key = _token_cache_key(token)
+    now = time.time()
+    cached_user = _get_cached_user(cache_key, now)
+    if cached_user is not None:
+        return cached_user
+    
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        payload = decode_access_token(token)
+        user_id: str = claims_subject(payload)
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    # Epoch first: a revocation that lands after this read makes the entry stale
+    try:
+        epoch = _read_auth_epoch(user_id)
+        cacheable = True
+    except RedisError:
+        cacheable = False
+    
+    user = db.execute(_AUTHORIZED_USER, {"user_id": user_id}).scalar_one_or_none()
+    if user is not None:
+        if cacheable:
+            _cache_user(cache_key, user, epoch, min(payload.get("exp", now), now + TOKEN_USER_CACHE_TTL_SECONDS))
+        return user
+    
+    # MILESTONE 6: Check account status (second query only when rejecting)
+    user_status = db.execute(_USER_STATUS, {"user_id": user_id}).first()
+    if user_status is None:
         raise credentials_exception
     
-    # MILESTONE 6: Check account status
-    if not user.is_active:
+    if not user_status.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account has been disabled"
         )
     
-    if not user.email_verified:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Email not verified. Please verify your email to continue."
-        )
-    
-    return user
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Email not verified. Please verify your email to continue."
+    )
 
 # MILESTONE 7: Enhanced role-based access control
 def _log_forbidden_access(user_id: str, required_roles: list[str], user_role: str, db: Session):
-    """Log forbidden access attempts for security audit trail."""
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=user_id,
-        action="forbidden_access",
-        target="route_access",
-        event_metadata={
+    """
+    Log forbidden access attempts for security audit trail.
+    
+    Appended to the audit stream (batched into Postgres by the audit
+    consumer), so a burst of 403s doesn't become a burst of commits. Only
+    commits here if Redis is down and the row was staged on the request's
+    session (the same one get_current_user already resolved).
+    """
+    streamed = audit_log(
+        db,
+        user_id,
+        "forbidden_access",
+        "route_access",
+        {
             "required_roles": required_roles,
             "user_role": user_role,
             "reason": "Insufficient role/permissions"
         },
-        timestamp=datetime.utcnow()
     )
-    db.add(audit)
-    db.commit()
+    if not streamed:
+        db.commit()
 
 def require_role(required_roles: list[str] | str):
     """
@@ -88,15 +209,18 @@ def require_role(required_roles: list[str] | str):
     # Normalize to list
     if isinstance(required_roles, str):
         required_roles = [required_roles]
+    # Hash lookup per request; message built once
+    allowed_roles = frozenset(required_roles)
+    detail = f"Insufficient permissions. Required roles: {', '.join(required_roles)}"
     
     def role_checker(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-        if current_user.role not in required_roles:
+        if current_user.role not in allowed_roles:
             # Log forbidden access
             _log_forbidden_access(current_user.id, required_roles, current_user.role, db)
             
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Insufficient permissions. Required roles: {', '.join(required_roles)}"
+                detail=detail
             )
         return current_user
     
@@ -116,18 +240,21 @@ def require_permission(permission: str):
     """
     from app.config import PERMISSION_ROLES
     
-    allowed_roles = PERMISSION_ROLES.get(permission, [])
+    allowed_roles = PERMISSION_ROLES.get(permission, frozenset())
     if not allowed_roles:
         raise ValueError(f"Permission '{permission}' not found in configuration")
+    # Stable, JSON-serializable form for audit metadata and error messages
+    allowed_roles_list = sorted(allowed_roles)
+    detail = f"Insufficient permissions for '{permission}'. Required roles: {', '.join(allowed_roles_list)}"
     
     def permission_checker(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
         if current_user.role not in allowed_roles:
             # Log forbidden access
-            _log_forbidden_access(current_user.id, allowed_roles, current_user.role, db)
+            _log_forbidden_access(current_user.id, allowed_roles_list, current_user.role, db)
             
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Insufficient permissions for '{permission}'. Required roles: {', '.join(allowed_roles)}"
+                detail=detail
             )
         return current_user
     
@@ -3,10 +3,29 @@ GraphQL Schema - Type definitions for GraphQL API
 Provides flexible querying of risks, events, users, and analytics data
 """
 
+import asyncio
+import base64
+import logging
+import time
+from functools import lru_cache
 import strawberry
-from typing import List, Optional
-from datetime import datetime
-from sqlalchemy.orm import Session
+from strawberry.dataloader import DataLoader
+from strawberry.extensions import AddValidationRules, QueryDepthLimiter
+from graphql import GraphQLError, ValidationRule, get_named_type
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from typing import Annotated, List, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import select, bindparam, func, case, desc, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import graphql_rejected_queries
+from app.core.timeutils import utc_now
+from app.models import User
+from app.models.events import RiskDecision
+from app.services.advanced_analytics import get_advanced_analytics_service
+from app.services.analytics_rollup import ROLLUP_SUPPORTED, rollup_summary, rollup_since
+from app.services.bulk_fetch import users_by_ids, rule_evaluations_by_decision_ids
+
+logger = logging.getLogger("sentineliq.graphql")
 
 # ===== SCALAR TYPES =====
 
@@ -21,6 +40,7 @@ class RiskScore:
     confidence: float
     triggered_rules: List[str]
     timestamp: datetime
+    cursor: str = strawberry.field(description="Opaque keyset cursor; pass as `before` to get the next (older) page")
 
 
 @strawberry.type
@@ -67,8 +87,15 @@ class EventDetail:
     risk_level: str
     recommended_action: str
     timestamp: datetime
-    triggered_rules: List[RuleInfo]
+    cursor: str = strawberry.field(description="Opaque keyset cursor; pass as `before` to get the next (older) page")
+    decision_id: strawberry.Private[str]
     metadata: Optional[str] = None
+    
+    @strawberry.field
+    async def triggered_rules(self, info: strawberry.types.Info) -> List[RuleInfo]:
+        """Rule evaluations behind this decision (batched across sibling events)"""
+        rules = await info.context["loaders"]["rules_by_decision"].load(self.decision_id)
+        return [_rule_info(r) for r in rules]
 
 
 @strawberry.type
@@ -104,6 +131,329 @@ class RuleStat:
     f1_score: float
 
 
+# Dashboard aggregates (cohorts, rule performance) scan whole tables; results
+# are reused for the rest of the current minute, keyed by (resolver, days, minute).
+ANALYTICS_CACHE_TTL_SECONDS = 60
+_ANALYTICS_CACHE_MAX_ENTRIES = 32
+_analytics_cache: dict = {}
+
+
+async def _cached_analytics(name: str, days: int, compute):
+    key = (name, days, int(time.time() // ANALYTICS_CACHE_TTL_SECONDS))
+    result = _analytics_cache.get(key)
+    if result is None:
+        result = await compute()
+        if len(_analytics_cache) >= _ANALYTICS_CACHE_MAX_ENTRIES:
+            # Entries from earlier minutes are dead keys; a full reset is simplest
+            _analytics_cache.clear()
+        _analytics_cache[key] = result
+    return result
+
+
+# ===== QUERY LIMITS =====
+# Resolver arguments are client-controlled; clamp them so no single field can
+# ask for an unbounded page or history window.
+MAX_LIMIT = 200
+MAX_DAYS = 90
+
+# userProfile / highRiskUsers profiles always cover this fixed window
+PROFILE_DAYS = 30
+
+
+def _clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _clamp_days(days: int) -> int:
+    return max(1, min(days, MAX_DAYS))
+
+
+# ===== SESSION ACCESS =====
+# Resolvers share the request's AsyncSession but strawberry runs sibling
+# fields concurrently, and an AsyncSession allows one operation at a time;
+# every use goes through the request's lock. Results are buffered, so they
+# stay readable after the lock is released.
+
+async def _execute(context: dict, stmt, params: dict):
+    async with context["db_lock"]:
+        return await context["db"].execute(stmt, params)
+
+
+async def _run_sync(context: dict, fn):
+    """Run fn(sync_session) on the request session (for sync service code)."""
+    async with context["db_lock"]:
+        return await context["db"].run_sync(fn)
+
+
+# ===== DATA LOADERS =====
+
+def create_loaders(context: dict) -> dict:
+    """
+    Per-request DataLoaders, built by the GraphQL context getter.
+    
+    Keys requested anywhere in one operation (e.g. several aliased riskEvent
+    fields) are coalesced into a single IN (...) query per loader.
+    """
+    
+    async def load_rules_by_decision(decision_ids: List[str]) -> List[list]:
+        rules = await _run_sync(context, lambda session: rule_evaluations_by_decision_ids(session, decision_ids))
+        return [rules[decision_id] for decision_id in decision_ids]
+    
+    async def load_users_by_id(user_ids: List[str]) -> list:
+        users = await _run_sync(context, lambda session: users_by_ids(session, user_ids))
+        return [users.get(user_id) for user_id in user_ids]
+    
+    return {
+        "rules_by_decision": DataLoader(load_fn=load_rules_by_decision),
+        "users_by_id": DataLoader(load_fn=load_users_by_id),
+    }
+
+
+def create_context(db: AsyncSession, user) -> dict:
+    """GraphQL context for one request: its session, the session's lock, loaders."""
+    context = {"db": db, "db_lock": asyncio.Lock(), "user": user}
+    context["loaders"] = create_loaders(context)
+    return context
+
+
+# Score columns are sqlalchemy Float, so the driver already returns Python
+# floats (no Decimal); resolvers pass them through without per-row float().
+
+def _rule_info(rule) -> RuleInfo:
+    return RuleInfo(
+        name=rule.rule_name,
+        type=rule.rule_category,
+        score=rule.score_contribution or 0.0,
+        triggered=rule.matched,
+        confidence=rule.confidence
+    )
+
+
+# ===== KEYSET CURSORS =====
+# Clients page with an opaque cursor: urlsafe base64 of "<created_at>|<id>"
+# for the last row of the previous page. Ties on created_at are broken by id,
+# so rows sharing a timestamp are never skipped.
+
+_BEFORE_ARGUMENT = strawberry.argument(
+    description="Cursor of the last event on the previous page; returns the events after it (older)"
+)
+
+
+def _encode_cursor(created_at: datetime, decision_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{decision_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """Bind values for _before_cursor(); GraphQLError if the cursor is malformed."""
+    try:
+        created_at, decision_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return {"before": datetime.fromisoformat(created_at), "before_id": decision_id}
+    except (ValueError, UnicodeError):
+        raise GraphQLError("Invalid cursor")
+
+
+def _event_detail(decision) -> EventDetail:
+    """
+    EventDetail from a RiskDecision row (see _event_detail_columns).
+    triggered_rules resolves lazily through the rules_by_decision loader, so
+    it costs nothing unless selected and one IN (...) query when it is.
+    """
+    return EventDetail(
+        event_id=decision.event_id,
+        user_id=decision.user_id,
+        event_type=decision.event_type,
+        risk_score=decision.risk_score,
+        risk_level=decision.risk_level,
+        recommended_action=decision.recommended_action,
+        timestamp=decision.created_at,
+        cursor=_encode_cursor(decision.created_at, decision.id),
+        decision_id=decision.id
+    )
+
+
+# ===== PREBUILT STATEMENTS =====
+# Each resolver query shape is built once (per optional-filter combination)
+# with bindparams; calls only supply values, skipping per-request statement
+# construction and cache-key generation.
+#
+# Event queries select only the columns their GraphQL type exposes (plain
+# rows, no ORM entities): the JSON context/flag columns are never fetched and
+# nothing goes through the identity map.
+
+def _event_detail_columns():
+    return (
+        RiskDecision.id,
+        RiskDecision.event_id,
+        RiskDecision.user_id,
+        RiskDecision.event_type,
+        RiskDecision.risk_score,
+        RiskDecision.risk_level,
+        RiskDecision.recommended_action,
+        RiskDecision.created_at
+    )
+
+
+@lru_cache(maxsize=None)
+def _decision_by_event_id_stmt():
+    return select(*_event_detail_columns()).where(RiskDecision.event_id == bindparam("event_id"))
+
+
+def _before_cursor():
+    """
+    Keyset condition for "older than (:before, :before_id)", newest first
+    (the decoded cursor, see _decode_cursor).
+    The id breaks ties between decisions sharing a created_at; the plain
+    created_at bound keeps the range on the created_at indexes, which the
+    row comparison alone would not use.
+    """
+    return (
+        RiskDecision.created_at <= bindparam("before"),
+        tuple_(RiskDecision.created_at, RiskDecision.id) < tuple_(bindparam("before"), bindparam("before_id"))
+    )
+
+
+_NEWEST_FIRST = (desc(RiskDecision.created_at), desc(RiskDecision.id))
+
+
+@lru_cache(maxsize=None)
+def _recent_decisions_stmt(by_level: bool, paged: bool):
+    stmt = select(
+        RiskDecision.id,
+        RiskDecision.event_id,
+        RiskDecision.user_id,
+        RiskDecision.risk_score,
+        RiskDecision.risk_level,
+        RiskDecision.recommended_action,
+        RiskDecision.triggered_rules,
+        RiskDecision.created_at
+    )
+    if by_level:
+        stmt = stmt.where(RiskDecision.risk_level == bindparam("risk_level"))
+    if paged:
+        stmt = stmt.where(*_before_cursor())
+    return stmt.order_by(*_NEWEST_FIRST).limit(bindparam("limit"))
+
+
+@lru_cache(maxsize=None)
+def _user_decisions_stmt(paged: bool):
+    stmt = select(*_event_detail_columns()).where(
+        RiskDecision.user_id == bindparam("user_id"),
+        RiskDecision.created_at >= bindparam("cutoff")
+    )
+    if paged:
+        stmt = stmt.where(*_before_cursor())
+    return stmt.order_by(*_NEWEST_FIRST).limit(bindparam("limit"))
+
+
+_RISK_LEVELS = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+
+def _level_count(level: str):
+    return func.coalesce(func.sum(case((RiskDecision.risk_level == level, 1), else_=0)), 0)
+
+
+@lru_cache(maxsize=None)
+def _risk_summary_stmt(by_user: bool):
+    stmt = select(
+        func.count().label("total"),
+        *(_level_count(level).label(level) for level in _RISK_LEVELS),
+        func.avg(RiskDecision.risk_score).label("average"),
+        func.max(RiskDecision.created_at).label("last_event"),
+        func.coalesce(func.sum(case((RiskDecision.recommended_action == "block", 1), else_=0)), 0).label("blocks")
+    ).where(RiskDecision.created_at >= bindparam("cutoff"))
+    if by_user:
+        stmt = stmt.where(RiskDecision.user_id == bindparam("user_id"))
+    return stmt
+
+
+@lru_cache(maxsize=None)
+def _high_risk_users_stmt():
+    # Top-N users ranked by average score over the requested window, each
+    # with the same fixed PROFILE_DAYS profile userProfile reports, in one
+    # statement joined to users
+    top = select(
+        RiskDecision.user_id.label("user_id"),
+        func.avg(RiskDecision.risk_score).label("rank_score")
+    ).where(
+        RiskDecision.created_at >= bindparam("cutoff")
+    ).group_by(RiskDecision.user_id).order_by(
+        desc("rank_score")
+    ).limit(bindparam("limit")).subquery()
+    
+    profile = select(
+        RiskDecision.user_id.label("user_id"),
+        func.count().label("total"),
+        func.avg(RiskDecision.risk_score).label("avg_score"),
+        func.max(RiskDecision.created_at).label("last_event"),
+        _level_count("CRITICAL").label("critical"),
+        _level_count("HIGH").label("high"),
+        _level_count("MEDIUM").label("medium"),
+        _level_count("LOW").label("low")
+    ).where(
+        RiskDecision.created_at >= bindparam("profile_cutoff"),
+        RiskDecision.user_id.in_(select(top.c.user_id))
+    ).group_by(RiskDecision.user_id).subquery()
+    
+    return select(
+        User.email,
+        top.c.user_id,
+        profile.c.total,
+        profile.c.avg_score,
+        profile.c.last_event,
+        profile.c.critical,
+        profile.c.high,
+        profile.c.medium,
+        profile.c.low
+    ).join(top, User.id == top.c.user_id).outerjoin(
+        profile, profile.c.user_id == top.c.user_id
+    ).order_by(desc(top.c.rank_score))
+
+
+async def _risk_summary(context: dict, cutoff: datetime, user_id: Optional[str] = None) -> dict:
+    """
+    Risk-level breakdown of RiskDecisions since cutoff (optionally for one
+    user), aggregated in SQL into a single row instead of hydrating every
+    decision.
+    """
+    params = {"cutoff": cutoff}
+    if user_id is not None:
+        params["user_id"] = user_id
+    row = (await _execute(context, _risk_summary_stmt(user_id is not None), params)).one()
+    
+    return {
+        "counts": {level: row._mapping[level] for level in _RISK_LEVELS},
+        "total": row.total,
+        "average": row.average or 0.0,
+        "last_event": row.last_event,
+        "blocks": row.blocks,
+    }
+
+
+async def _load_user_profile(info: strawberry.types.Info, user_id: str) -> Optional[UserProfile]:
+    """PROFILE_DAYS risk profile for one user."""
+    
+    user = await info.context["loaders"]["users_by_id"].load(user_id)
+    if not user:
+        return None
+    
+    cutoff = utc_now() - timedelta(days=PROFILE_DAYS)
+    
+    summary = await _risk_summary(info.context, cutoff, user_id=user_id)
+    counts = summary["counts"]
+    
+    return UserProfile(
+        user_id=user_id,
+        email=user.email,
+        total_events=summary["total"],
+        critical_count=counts.get("CRITICAL", 0),
+        high_count=counts.get("HIGH", 0),
+        medium_count=counts.get("MEDIUM", 0),
+        low_count=counts.get("LOW", 0),
+        average_risk_score=summary["average"],
+        last_event=summary["last_event"]
+    )
+
+
 # ===== QUERY ROOT =====
 
 @strawberry.type
@@ -113,289 +463,273 @@ class Query:
     # ===== RISK & EVENT QUERIES =====
     
     @strawberry.field
-    def risk_event(self, event_id: str, info: strawberry.types.Info) -> Optional[EventDetail]:
+    async def risk_event(self, event_id: str, info: strawberry.types.Info) -> Optional[EventDetail]:
         """Get details for a specific risk event"""
-        db: Session = info.context["db"]
-        from app.models.events import RiskDecision, RuleEvaluation
-        
-        decision = db.query(RiskDecision).filter(RiskDecision.event_id == event_id).first()
+        result = await _execute(info.context, _decision_by_event_id_stmt(), {"event_id": event_id})
+        decision = result.first()
         if not decision:
             return None
         
-        rules = db.query(RuleEvaluation).filter(
-            RuleEvaluation.risk_decision_id == decision.id
-        ).all()
-        
-        return EventDetail(
-            event_id=decision.event_id,
-            user_id=decision.user_id,
-            event_type=decision.event_id.split(":")[0],
-            risk_score=float(decision.risk_score),
-            risk_level=decision.risk_level,
-            recommended_action=decision.recommended_action,
-            timestamp=decision.created_at,
-            triggered_rules=[
-                RuleInfo(
-                    name=r.rule_name,
-                    type=r.rule_type,
-                    score=float(r.score_contribution),
-                    triggered=r.triggered
-                )
-                for r in rules
-            ]
-        )
+        return _event_detail(decision)
     
     @strawberry.field
-    def recent_risk_events(
+    async def recent_risk_events(
         self,
         limit: int = 50,
         risk_level: Optional[str] = None,
+        before: Annotated[Optional[str], _BEFORE_ARGUMENT] = None,
         info: strawberry.types.Info = None
     ) -> List[RiskScore]:
-        """Get recent risk events"""
-        db: Session = info.context["db"]
-        from app.models.events import RiskDecision
-        from sqlalchemy import desc
+        """
+        Get recent risk events, newest first.
         
-        query = db.query(RiskDecision)
+        Page with `before` = the last returned `cursor` (keyset pagination:
+        each page is an index range scan, not an OFFSET over earlier rows).
+        """
+        params = {"limit": _clamp_limit(limit)}
         if risk_level:
-            query = query.filter(RiskDecision.risk_level == risk_level.upper())
+            params["risk_level"] = risk_level.upper()
+        if before:
+            params.update(_decode_cursor(before))
         
-        events = query.order_by(desc(RiskDecision.created_at)).limit(limit).all()
+        result = await _execute(info.context, _recent_decisions_stmt(bool(risk_level), bool(before)), params)
+        events = result.all()
         
         return [
             RiskScore(
                 event_id=e.event_id,
                 user_id=e.user_id,
-                risk_score=float(e.risk_score),
+                risk_score=e.risk_score,
                 risk_level=e.risk_level,
                 recommended_action=e.recommended_action,
                 confidence=1.0,
                 triggered_rules=e.triggered_rules or [],
-                timestamp=e.created_at
+                timestamp=e.created_at,
+                cursor=_encode_cursor(e.created_at, e.id)
             )
             for e in events
         ]
     
     @strawberry.field
-    def user_events(
+    async def user_events(
         self,
         user_id: str,
         limit: int = 50,
         days: int = 30,
+        before: Annotated[Optional[str], _BEFORE_ARGUMENT] = None,
         info: strawberry.types.Info = None
     ) -> List[EventDetail]:
-        """Get all events for a specific user"""
-        from datetime import timedelta
-        db: Session = info.context["db"]
-        from app.models.events import RiskDecision, RuleEvaluation
-        from sqlalchemy import desc, and_
+        """
+        Get all events for a specific user, newest first.
         
-        cutoff = datetime.utcnow() - timedelta(days=days)
+        Page with `before` = the last returned `cursor`.
+        """
+        params = {
+            "user_id": user_id,
+            "cutoff": utc_now() - timedelta(days=_clamp_days(days)),
+            "limit": _clamp_limit(limit)
+        }
+        if before:
+            params.update(_decode_cursor(before))
         
-        decisions = db.query(RiskDecision).filter(
-            and_(
-                RiskDecision.user_id == user_id,
-                RiskDecision.created_at >= cutoff
-            )
-        ).order_by(desc(RiskDecision.created_at)).limit(limit).all()
-        
-        results = []
-        for decision in decisions:
-            rules = db.query(RuleEvaluation).filter(
-                RuleEvaluation.risk_decision_id == decision.id
-            ).all()
-            
-            results.append(EventDetail(
-                event_id=decision.event_id,
-                user_id=decision.user_id,
-                event_type=decision.event_id.split(":")[0],
-                risk_score=float(decision.risk_score),
-                risk_level=decision.risk_level,
-                recommended_action=decision.recommended_action,
-                timestamp=decision.created_at,
-                triggered_rules=[
-                    RuleInfo(
-                        name=r.rule_name,
-                        type=r.rule_type,
-                        score=float(r.score_contribution),
-                        triggered=r.triggered
-                    )
-                    for r in rules
-                ]
-            ))
+        decisions = (await _execute(info.context, _user_decisions_stmt(bool(before)), params)).all()
         
-        return results
+        return [_event_detail(decision) for decision in decisions]
     
     # ===== USER QUERIES =====
     
     @strawberry.field
-    def user_profile(self, user_id: str, info: strawberry.types.Info) -> Optional[UserProfile]:
+    async def user_profile(self, user_id: str, info: strawberry.types.Info) -> Optional[UserProfile]:
         """Get user risk profile"""
-        db: Session = info.context["db"]
-        from app.models import User
-        from app.models.events import RiskDecision
-        from datetime import timedelta
-        from sqlalchemy import and_, desc
-        
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return None
-        
-        cutoff = datetime.utcnow() - timedelta(days=30)
-        
-        decisions = db.query(RiskDecision).filter(
-            and_(
-                RiskDecision.user_id == user_id,
-                RiskDecision.created_at >= cutoff
-            )
-        ).all()
-        
-        risk_levels = {}
-        total_score = 0.0
-        for level in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
-            count = sum(1 for d in decisions if d.risk_level == level)
-            risk_levels[level] = count
-        
-        avg_score = (sum(d.risk_score for d in decisions) / len(decisions)) if decisions else 0.0
-        last_event = max((d.created_at for d in decisions), default=None) if decisions else None
-        
-        return UserProfile(
-            user_id=user_id,
-            email=user.email,
-            total_events=len(decisions),
-            critical_count=risk_levels.get("CRITICAL", 0),
-            high_count=risk_levels.get("HIGH", 0),
-            medium_count=risk_levels.get("MEDIUM", 0),
-            low_count=risk_levels.get("LOW", 0),
-            average_risk_score=float(avg_score),
-            last_event=last_event
-        )
+        return await _load_user_profile(info, user_id)
     
     @strawberry.field
-    def high_risk_users(
+    async def high_risk_users(
         self,
         days: int = 30,
         limit: int = 10,
         info: strawberry.types.Info = None
     ) -> List[UserProfile]:
-        """Get users with highest risk scores"""
-        db: Session = info.context["db"]
-        from app.models import User
-        from app.models.events import RiskDecision
-        from datetime import timedelta
-        from sqlalchemy import and_, func, desc
-        
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        high_risk_users = db.query(
-            RiskDecision.user_id,
-            func.avg(RiskDecision.risk_score).label("avg_score")
-        ).filter(
-            RiskDecision.created_at >= cutoff
-        ).group_by(RiskDecision.user_id).order_by(
-            desc(func.avg(RiskDecision.risk_score))
-        ).limit(limit).all()
+        """
+        Get users with highest risk scores.
         
-        results = []
-        for user_id, avg_score in high_risk_users:
-            profile = Query.user_profile(self, user_id, info)
-            if profile:
-                results.append(profile)
+        Users are ranked by average score over the last `days`; each profile
+        covers the last PROFILE_DAYS (30), as in userProfile.
+        """
+        now = utc_now()
+        params = {
+            "cutoff": now - timedelta(days=_clamp_days(days)),
+            "profile_cutoff": now - timedelta(days=PROFILE_DAYS),
+            "limit": _clamp_limit(limit)
+        }
+        rows = (await _execute(info.context, _high_risk_users_stmt(), params)).all()
         
-        return results
+        return [
+            UserProfile(
+                user_id=row.user_id,
+                email=row.email,
+                total_events=row.total or 0,
+                critical_count=row.critical or 0,
+                high_count=row.high or 0,
+                medium_count=row.medium or 0,
+                low_count=row.low or 0,
+                average_risk_score=row.avg_score or 0.0,
+                last_event=row.last_event
+            )
+            for row in rows
+        ]
     
     # ===== ANALYTICS QUERIES =====
     
-    @strawberry.field
-    def analytics_summary(
+    @strawberry.field(description=(
+        "Overall risk analytics. On PostgreSQL this is read from a daily rollup: "
+        "it covers whole UTC days starting `days` days ago and can lag live data "
+        "by up to 5 minutes. Other databases aggregate the last `days` x 24h live."
+    ))
+    async def analytics_summary(
         self,
         days: int = 30,
         info: strawberry.types.Info = None
     ) -> Analytics:
-        """Get overall analytics summary"""
-        db: Session = info.context["db"]
-        from app.models.events import RiskDecision
-        from datetime import timedelta
-        from sqlalchemy import func
-        
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        events = db.query(RiskDecision).filter(
-            RiskDecision.created_at >= cutoff
-        ).all()
-        
-        total = len(events)
-        critical = sum(1 for e in events if e.risk_level == "CRITICAL")
-        high = sum(1 for e in events if e.risk_level == "HIGH")
-        medium = sum(1 for e in events if e.risk_level == "MEDIUM")
-        low = sum(1 for e in events if e.risk_level == "LOW")
-        
-        avg_score = (sum(e.risk_score for e in events) / total) if total > 0 else 0.0
-        blocks = sum(1 for e in events if e.recommended_action == "block")
-        block_rate = (blocks / total * 100) if total > 0 else 0.0
+        """Get overall analytics summary (daily rollup on PostgreSQL, live elsewhere)"""
+        days = _clamp_days(days)
+        if ROLLUP_SUPPORTED:
+            async with info.context["db_lock"]:
+                summary = await rollup_summary(info.context["db"], rollup_since(days))
+        else:
+            summary = await _risk_summary(info.context, utc_now() - timedelta(days=days))
+        counts = summary["counts"]
+        total = summary["total"]
+        block_rate = (summary["blocks"] / total * 100) if total > 0 else 0.0
         
         return Analytics(
             total_events=total,
-            critical_events=critical,
-            high_events=high,
-            medium_events=medium,
-            low_events=low,
-            average_risk_score=float(avg_score),
-            block_rate=float(block_rate),
+            critical_events=counts.get("CRITICAL", 0),
+            high_events=counts.get("HIGH", 0),
+            medium_events=counts.get("MEDIUM", 0),
+            low_events=counts.get("LOW", 0),
+            average_risk_score=summary["average"],
+            block_rate=block_rate,
             period_days=days
         )
     
     @strawberry.field
-    def user_cohorts(
+    async def user_cohorts(
         self,
         days: int = 30,
         info: strawberry.types.Info = None
     ) -> List[Cohort]:
         """Get user risk cohorts"""
-        db: Session = info.context["db"]
-        from app.services.advanced_analytics import get_advanced_analytics_service
+        days = _clamp_days(days)
         
-        service = get_advanced_analytics_service()
-        cohort_data = service.analyze_user_cohorts(db, days=days)
-        
-        cohorts = []
-        for cohort_type, data in cohort_data["cohorts"].items():
-            cohorts.append(Cohort(
-                cohort_type=cohort_type,
-                user_count=data["count"],
-                percentage=float(data["percentage"])
-            ))
+        async def compute() -> List[Cohort]:
+            service = get_advanced_analytics_service()
+            cohort_data = await _run_sync(info.context, lambda session: service.analyze_user_cohorts(session, days=days))
+            return [
+                Cohort(
+                    cohort_type=cohort_type,
+                    user_count=data["count"],
+                    percentage=float(data["percentage"])
+                )
+                for cohort_type, data in cohort_data["cohorts"].items()
+            ]
         
-        return cohorts
+        return await _cached_analytics("user_cohorts", days, compute)
     
     @strawberry.field
-    def rule_performance(
+    async def rule_performance(
         self,
         days: int = 30,
         info: strawberry.types.Info = None
     ) -> List[RuleStat]:
         """Get performance metrics for all rules"""
-        db: Session = info.context["db"]
-        from app.services.advanced_analytics import get_advanced_analytics_service
+        days = _clamp_days(days)
         
-        service = get_advanced_analytics_service()
-        metrics = service.get_rule_performance_metrics(db, days=days)
+        async def compute() -> List[RuleStat]:
+            service = get_advanced_analytics_service()
+            metrics = await _run_sync(info.context, lambda session: service.get_rule_performance_metrics(session, days=days))
+            rules = [
+                RuleStat(
+                    name=rule_name,
+                    total_triggers=stats["triggered"],
+                    trigger_rate=float(stats["trigger_rate"]),
+                    precision=stats["precision"],
+                    recall=stats["recall"],
+                    f1_score=stats["f1_score"]
+                )
+                for rule_name, stats in metrics["rules"].items()
+            ]
+            return sorted(rules, key=lambda x: x.f1_score, reverse=True)
         
-        rules = []
-        for rule_name, stats in metrics["rules"].items():
-            rules.append(RuleStat(
-                name=rule_name,
-                total_triggers=stats["triggered"],
-                trigger_rate=float(stats["trigger_rate"]),
-                precision=stats["precision"],
-                recall=stats["recall"],
-                f1_score=stats["f1_score"]
+        return await _cached_analytics("rule_performance", days, compute)
+
+
+# ===== QUERY COST =====
+# Clamping bounds each field; aliases and nesting can still multiply them
+# (twenty aliased userEvents(limit: 200) selecting triggeredRules). Queries
+# are priced during validation and refused before any resolver runs.
+MAX_QUERY_DEPTH = 6
+MAX_QUERY_COST = 10_000
+
+
+def _limit_argument(node: FieldNode, field_def) -> int:
+    """Page size a list field will return (variables priced at the cap)."""
+    for argument in node.arguments:
+        if argument.name.value == "limit":
+            value = getattr(argument.value, "value", None)
+            return _clamp_limit(int(value)) if value is not None else MAX_LIMIT
+    default = field_def.args["limit"].default_value
+    return _clamp_limit(default) if isinstance(default, int) else MAX_LIMIT
+
+
+class QueryCostRule(ValidationRule):
+    """
+    Rejects operations whose estimated row count exceeds MAX_QUERY_COST.
+    
+    Every selected field costs one per parent row; a field with a `limit`
+    argument multiplies the rows its sub-selection is evaluated for.
+    """
+    
+    def enter_operation_definition(self, node, *_args):
+        schema = self.context.schema
+        cost = self._selection_cost(node.selection_set, schema.query_type, 1)
+        if cost > MAX_QUERY_COST:
+            name = node.name.value if node.name else "<anonymous>"
+            graphql_rejected_queries.labels(reason="cost").inc()
+            logger.warning(f"[GRAPHQL] Rejected operation {name}: cost {cost} > {MAX_QUERY_COST}")
+            self.report_error(GraphQLError(
+                f"Query cost {cost} exceeds the maximum of {MAX_QUERY_COST}", node
             ))
-        
-        return sorted(rules, key=lambda x: x.f1_score, reverse=True)
+    
+    def _selection_cost(self, selection_set, parent_type, rows: int, fragments: frozenset = frozenset()) -> int:
+        if selection_set is None:
+            return 0
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_def = getattr(parent_type, "fields", {}).get(selection.name.value)
+                if field_def is None:
+                    continue
+                field_rows = rows * _limit_argument(selection, field_def) if "limit" in field_def.args else rows
+                cost += rows + self._selection_cost(selection.selection_set, get_named_type(field_def.type), field_rows, fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                cost += self._selection_cost(selection.selection_set, parent_type, rows, fragments)
+            elif isinstance(selection, FragmentSpreadNode):
+                # Cyclic spreads are rejected by NoFragmentCycles; just don't recurse forever
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                if fragment is not None and name not in fragments:
+                    cost += self._selection_cost(fragment.selection_set, parent_type, rows, fragments | {name})
+        return cost
 
 
+@lru_cache(maxsize=1)
 def create_schema() -> strawberry.Schema:
-    """Create and return the GraphQL schema"""
-    return strawberry.Schema(query=Query)
+    """Create and return the GraphQL schema (built once per process)"""
+    return strawberry.Schema(
+        query=Query,
+        extensions=[
+            QueryDepthLimiter(max_depth=MAX_QUERY_DEPTH),
+            AddValidationRules([QueryCostRule]),
+        ]
+    )
@@ -1,4 +1,12 @@
-from fastapi import FastAPI, Response
+import os
+
+# prometheus_client picks its value backend at import time, so the multiprocess
+# directory has to exist before any module below imports it. The container
+# entrypoint wipes it per run; this only covers starting uvicorn directly.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from fastapi import FastAPI
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.api import auth
 from app.routes import (
@@ -6,24 +14,41 @@ from app.routes import (
     analytics, integrations, advanced_analytics, rules, search, graphql_api, ml_mobile, milestone_1_2
 )
 from app.middleware.security_headers import SecurityHeadersMiddleware
-from app.middleware.request_logging import RequestLoggingMiddleware, UserTrackingMiddleware
+from app.middleware.request_logging import RequestLoggingMiddleware, UserTrackingMiddleware, log_unhandled_exception
 from app.core.pii_scrubber import PIIScrubbingMiddleware
-from app.core.db import init_db, SessionLocal, engine
+from app.core.db import init_db, SessionLocal
 from app.services.outbox import initialize_outbox_poller, shutdown_outbox_poller
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from app.services.audit_stream import initialize_audit_consumer, shutdown_audit_consumer
+from app.services.analytics_rollup import initialize_rollup_refresher, shutdown_rollup_refresher
+from prometheus_client import CollectorRegistry, REGISTRY, make_asgi_app, multiprocess
 from prometheus_fastapi_instrumentator import Instrumentator
-from app.models import Base
+from starlette.concurrency import run_in_threadpool
 from app.core.seed import seed_default_org
 from app.core.logging import logger
-import time
 
 app = FastAPI(
     title="SentinelIQ",
     description="Fintech Risk & Security Intelligence Platform"
 )
 
-# Initialize Prometheus instrumentator BEFORE middleware setup
-Instrumentator().instrument(app).expose(app)
+# Initialize Prometheus instrumentator BEFORE middleware setup.
+# Guarded so a re-import of this module can't register the handlers twice.
+if not getattr(app.state, "_instrumented", False):
+    Instrumentator().instrument(app)
+    app.state._instrumented = True
+
+
+def _metrics_registry():
+    """Aggregate across uvicorn workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+# Scrapes are served by prometheus_client's own ASGI app (bytes straight out)
+app.mount("/metrics", make_asgi_app(registry=_metrics_registry()))
 
 # MILESTONE 1 & 2: PII Scrubbing Middleware
 app.add_middleware(PIIScrubbingMiddleware)
@@ -31,6 +56,7 @@ app.add_middleware(PIIScrubbingMiddleware)
 # MILESTONE 8: Logging and request tracking middleware
 app.add_middleware(UserTrackingMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
+app.add_exception_handler(Exception, log_unhandled_exception)
 
 # Security middleware (OWASP hardening)
 app.add_middleware(SecurityHeadersMiddleware)
@@ -54,16 +80,27 @@ app.include_router(graphql_api.router)  # GraphQL API
 app.include_router(ml_mobile.router)  # ML models and Mobile SDK
 app.include_router(milestone_1_2.router)  # MILESTONE 1 & 2: Shadow Mode, Link Analysis, Audit
 
-init_db()
-
 
 # ========== STARTUP & SHUTDOWN HOOKS ==========
 
+def _init_database():
+    """Create missing tables and seed the default org (blocking; run off the event loop)."""
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_default_org(db)
+    finally:
+        db.close()
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize background workers and services."""
+    """Initialize the database, background workers and services."""
     logger.info("[STARTUP] Initializing SentinelIQ services...")
     
+    await run_in_threadpool(_init_database)
+    logger.info("[STARTUP] ✅ Database initialized")
+    
     # MILESTONE 1 & 2: Start outbox poller
     db = SessionLocal()
     try:
@@ -74,6 +111,20 @@ async def startup_event():
     finally:
         db.close()
     
+    # Drain audit logs / login attempts from the audit stream into Postgres
+    try:
+        await initialize_audit_consumer()
+        logger.info("[STARTUP] ✅ Audit consumer initialized")
+    except Exception as e:
+        logger.error(f"[STARTUP] ❌ Failed to initialize audit consumer: {e}")
+    
+    # Keep the analytics rollup (materialized view) fresh
+    try:
+        await initialize_rollup_refresher()
+        logger.info("[STARTUP] ✅ Rollup refresher initialized")
+    except Exception as e:
+        logger.error(f"[STARTUP] ❌ Failed to initialize rollup refresher: {e}")
+    
     logger.info("[STARTUP] ✅ All services started")
 
 
@@ -84,35 +135,14 @@ async def shutdown_event():
     
     # MILESTONE 1 & 2: Stop outbox poller
     await shutdown_outbox_poller()
-    logger.info("[SHUTDOWN] ✅ All services stopped")
-
-
-@app.on_event("startup")
-def startup():
-    Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        seed_default_org(db)
-        logger.info("Application startup - database initialized")
-    finally:
-        db.close()
+    await shutdown_audit_consumer()
+    await shutdown_rollup_refresher()
 
-@app.on_event("shutdown")
-def shutdown():
-    logger.info("Application shutdown")
+    # Drop this worker's livesum/liveall gauge files from the aggregate
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+    logger.info("[SHUTDOWN] ✅ All services stopped")
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
-
-@app.get("/metrics", include_in_schema=False)
-def get_metrics():
-    """Prometheus metrics endpoint - returns metrics in text/plain format"""
-    metrics_output = generate_latest(REGISTRY)
-    # Ensure proper encoding if bytes are returned
-    if isinstance(metrics_output, bytes):
-        metrics_output = metrics_output.decode('utf-8')
-    return Response(
-        content=metrics_output,
-        media_type="text/plain; version=0.0.4; charset=utf-8"
-    )
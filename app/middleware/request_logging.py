@@ -3,154 +3,154 @@ Milestone 8: Request/Response Logging Middleware
 Tracks all incoming requests and outgoing responses
 """
 
+import logging
 import time
-import uuid
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from os import urandom as _urandom
+from functools import lru_cache
+from fastapi import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.logging import logger, log_api_event
 from app.core.metrics import MetricsTracker
+from app.core.client_ip import get_client_ip
 import re
 
+# Durations only: monotonic, never jumps with NTP/wall-clock adjustments
+_now = time.perf_counter
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+# Endpoint normalization for metric labels: UUIDs and numeric path segments
+# become {id} (compiled once, not per request)
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+_NUMID_RE = re.compile(r'/\d+')
+
+
+# Real paths repeat (bounded by routes x live ids); bounded so a scan of
+# random URLs can't grow it
+@lru_cache(maxsize=2048)
+def _normalize_endpoint_cached(path: str) -> str:
+    return _NUMID_RE.sub('/{id}', _UUID_RE.sub('{id}', path))
+
+
+# Routes to exclude from detailed logging (health checks, metrics, etc): the
+# path itself or anything below it, matched in one anchored scan
+EXCLUDE_PATHS = (
+    "/health",
+    "/metrics",
+    "/docs",
+    "/openapi.json",
+    "/redoc"
+)
+_EXCLUDE_RE = re.compile(r'^(?:' + '|'.join(re.escape(p) for p in EXCLUDE_PATHS) + r')(?:/|$)')
+
+
+class RequestLoggingMiddleware:
     """
     Middleware for logging all HTTP requests and responses
     Tracks timing, user info, and status codes
+    
+    Pure ASGI (not BaseHTTPMiddleware): no per-request task group or
+    Request/Response wrapping; the status code is read off the
+    http.response.start message as it passes through send.
     """
     
-    # Routes to exclude from detailed logging (health checks, metrics, etc)
-    EXCLUDE_PATHS = [
-        "/health",
-        "/metrics",
-        "/docs",
-        "/openapi.json",
-        "/redoc"
-    ]
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Generate request ID
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Extract client IP
-        client_ip = self._get_client_ip(request)
-        request.state.ip_address = client_ip
+        # request.state for everything downstream is backed by scope["state"]
+        state = scope.setdefault("state", {})
         
-        # Skip detailed logging for excluded paths
-        if self._should_skip_logging(request.url.path):
-            response = await call_next(request)
-            return response
+        # Generate request ID (128 random bits as hex; no UUID object/formatting)
+        request_id = _urandom(16).hex()
+        state["request_id"] = request_id
         
-        # Start timer
-        start_time = time.time()
+        # Extract client IP
+        client_ip = get_client_ip(Request(scope))
+        state["ip_address"] = client_ip
+        
+        method = scope["method"]
+        path = scope["path"]
         
-        # Log incoming request
-        extra_data = {
+        # Per-request log context, built once and passed by reference as
+        # `extra` (never mutated; error logging copies it)
+        log_ctx = {
             "request_id": request_id,
             "ip_address": client_ip,
-            "method": request.method,
-            "path": request.url.path,
-            "query_params": dict(request.query_params),
+            "method": method,
+            "path": path,
         }
+        state["log_ctx"] = log_ctx
         
-        logger.info(
-            f"Incoming request: {request.method} {request.url.path}",
-            extra=extra_data
-        )
+        # Skip detailed logging for excluded paths
+        if self._should_skip_logging(path):
+            await self.app(scope, receive, send)
+            return
         
-        try:
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = time.time() - start_time
-            duration_ms = duration * 1000
-            
-            # Extract user ID if available
-            user_id = None
-            if hasattr(request.state, "user_id"):
-                user_id = request.state.user_id
-            
-            # Normalize endpoint for metrics (remove IDs, etc)
-            endpoint = self._normalize_endpoint(request.url.path)
-            
-            # Track metrics
-            MetricsTracker.track_api_request(
-                method=request.method,
-                endpoint=endpoint,
-                status_code=response.status_code,
-                duration=duration
-            )
-            
-            # Log response
-            log_api_event(
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
-                duration_ms=duration_ms,
-                user_id=user_id,
-                ip_address=client_ip
-            )
-            
-            return response
+        # Start timer
+        start_time = _now()
         
-        except Exception as exc:
-            # Calculate duration
-            duration = time.time() - start_time
-            
-            # Extract user ID if available
-            user_id = None
-            if hasattr(request.state, "user_id"):
-                user_id = request.state.user_id
-            
-            # Normalize endpoint for metrics
-            endpoint = self._normalize_endpoint(request.url.path)
-            
-            # Track error metric
-            MetricsTracker.track_api_error(
-                method=request.method,
-                endpoint=endpoint,
-                error_type=type(exc).__name__
-            )
-            
-            # Log error
-            error_data = {
-                "request_id": request_id,
-                "ip_address": client_ip,
-                "method": request.method,
-                "path": request.url.path,
-                "error_type": type(exc).__name__,
-                "error_message": str(exc),
-            }
+        # Log incoming request; the query string only rides along at DEBUG
+        if logger.isEnabledFor(logging.INFO):
+            extra_data = log_ctx
+            if logger.isEnabledFor(logging.DEBUG):
+                # Raw string straight from the scope; no parsed dict per request
+                extra_data = {**log_ctx, "query_string": scope["query_string"].decode("latin-1")}
             
-            logger.error(
-                f"Request error: {request.method} {request.url.path}",
-                extra=error_data,
-                exc_info=exc
+            logger.info(
+                f"Incoming request: {method} {path}",
+                extra=extra_data
             )
-            
-            raise
+        
+        response_start = {}
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_start["status_code"] = message["status"]
+                response_start["duration"] = _now() - start_time
+            await send(message)
+        
+        # Exceptions propagate untouched; log_unhandled_exception (registered
+        # on the app) records them once, outside the per-request hot path
+        await self.app(scope, receive, send_wrapper)
+        
+        # Time to response headers (what call_next used to measure)
+        status_code = response_start.get("status_code", 500)
+        duration = response_start.get("duration", _now() - start_time)
+        duration_ms = duration * 1000
+        
+        # Set up front by UserTrackingMiddleware; a plain dict read
+        user_id = state.get("user_id")
+        
+        # Normalize endpoint for metrics (remove IDs, etc)
+        endpoint = self._normalize_endpoint(path)
+        
+        # Track metrics
+        MetricsTracker.track_api_request(
+            method=method,
+            endpoint=endpoint,
+            status_code=status_code,
+            duration=duration
+        )
+        
+        # Log response
+        log_api_event(
+            method=method,
+            path=path,
+            status_code=status_code,
+            duration_ms=duration_ms,
+            user_id=user_id,
+            ip_address=client_ip
+        )
     
-    @staticmethod
-    def _get_client_ip(request: Request) -> str:
-        """Extract client IP from request"""
-        # Check X-Forwarded-For header first (for proxies)
-        x_forwarded_for = request.headers.get("x-forwarded-for")
-        if x_forwarded_for:
-            return x_forwarded_for.split(",")[0].strip()
-        
-        # Fall back to client address
-        if request.client:
-            return request.client.host
-        
-        return "unknown"
     
     @staticmethod
     def _should_skip_logging(path: str) -> bool:
         """Check if path should be excluded from detailed logging"""
-        return any(path.startswith(excluded) for excluded in RequestLoggingMiddleware.EXCLUDE_PATHS)
+        return _EXCLUDE_RE.match(path) is not None
     
     @staticmethod
     def _normalize_endpoint(path: str) -> str:
@@ -159,25 +159,74 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         Converts /users/123/profile to /users/{id}/profile
         """
         # Replace UUIDs and numeric IDs with placeholder
-        normalized = re.sub(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', '{id}', path, flags=re.IGNORECASE)
-        normalized = re.sub(r'/\d+', '/{id}', normalized)
-        return normalized
+        return _normalize_endpoint_cached(path)
 
 
-class UserTrackingMiddleware(BaseHTTPMiddleware):
+class UserTrackingMiddleware:
     """
     Middleware for tracking authenticated user info
     Adds user ID to request state
     """
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Try to extract user ID from token
-        auth_header = request.headers.get("authorization", "")
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            state = scope.setdefault("state", {})
+            # Always present, so readers never take the missing-attribute path
+            state["user_id"] = None
+            state["authenticated"] = False
+            
+            # Try to extract user ID from token
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    # User token is present - mark as authenticated
+                    # The actual user extraction happens in dependencies.py
+                    state["authenticated"] = value.startswith(b"Bearer ")
+                    break
         
-        if auth_header.startswith("Bearer "):
-            # User token is present - mark as authenticated
-            # The actual user extraction happens in dependencies.py
-            request.state.authenticated = True
+        await self.app(scope, receive, send)
+
+
+async def log_unhandled_exception(request: Request, exc: Exception) -> Response:
+    """
+    App-level handler for exceptions no route handled (registered in main.py)
+    
+    Runs in Starlette's ServerErrorMiddleware, which re-raises afterwards, so
+    the server still sees the traceback. request_id / ip_address come from the
+    state RequestLoggingMiddleware set up.
+    """
+    state = request.scope.get("state", {})
+    method = request.scope["method"]
+    path = request.scope["path"]
+    log_ctx = state.get("log_ctx") or {
+        "request_id": state.get("request_id"),
+        "ip_address": state.get("ip_address"),
+        "method": method,
+        "path": path,
+    }
+    
+    # Track error metric
+    MetricsTracker.track_api_error(
+        method=method,
+        endpoint=RequestLoggingMiddleware._normalize_endpoint(path),
+        error_type=type(exc).__name__
+    )
+    
+    # Log error
+    if logger.isEnabledFor(logging.ERROR):
+        error_data = {
+            **log_ctx,
+            "error_type": type(exc).__name__,
+            "error_message": str(exc),
+        }
         
-        response = await call_next(request)
-        return response
+        logger.error(
+            f"Request error: {method} {path}",
+            extra=error_data,
+            exc_info=exc
+        )
+    
+    # Same body ServerErrorMiddleware sends without a handler
+    return PlainTextResponse("Internal Server Error", status_code=500)
@@ -5,30 +5,54 @@ Adds OWASP-recommended security headers to all responses.
 Prevents common attacks: clickjacking, MIME sniffing, XSS, etc.
 """
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all HTTP responses."""
-    
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Prevent MIME sniffing (OWASP A06:2021 - Vulnerable Components)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        
-        # Prevent clickjacking (OWASP A05:2021 - Broken Access Control)
-        response.headers["X-Frame-Options"] = "DENY"
-        
-        # Enable XSS protection in older browsers
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        
-        # Control referrer information
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        # Restrict browser features (geolocation, microphone, camera)
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
-        return response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Raw ASGI header tuples, built once
+SECURITY_HEADERS = [
+    # Prevent MIME sniffing (OWASP A06:2021 - Vulnerable Components)
+    (b"x-content-type-options", b"nosniff"),
+
+    # Prevent clickjacking (OWASP A05:2021 - Broken Access Control)
+    (b"x-frame-options", b"DENY"),
+
+    # Enable XSS protection in older browsers
+    (b"x-xss-protection", b"1; mode=block"),
+
+    # Control referrer information
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+
+    # Restrict browser features (geolocation, microphone, camera)
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+
+
+class SecurityHeadersMiddleware:
+    """
+    Add security headers to all HTTP responses.
+
+    Pure ASGI: the headers are added to the http.response.start message as it
+    passes through send, without BaseHTTPMiddleware's per-request task and
+    response wrapping. They override any same-named header a route set.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [
+                    header for header in message.get("headers", ())
+                    if header[0].lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
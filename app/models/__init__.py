@@ -2,9 +2,11 @@
 SQLAlchemy ORM models for SentinelIQ.
 Organized as a package to properly separate concerns while maintaining a single Base declarative.
 """
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, DateTime, JSON, LargeBinary, Uuid, Index, func, text
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
+import os
+import time
 import uuid
 
 Base = declarative_base()
@@ -13,6 +15,17 @@ def generate_uuid():
     """Generate a UUID string for primary keys."""
     return str(uuid.uuid4())
 
+def generate_uuid7():
+    """
+    Generate a time-ordered UUIDv7 string (RFC 9562) for append-heavy tables.
+    48-bit unix-ms timestamp followed by random bits, so new keys land on the
+    rightmost btree page instead of random ones.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
 
 # ========== CORE MODELS ==========
 
@@ -42,12 +55,18 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow)
     
     organization = relationship("Organization", back_populates="users")
+    
+    __table_args__ = (
+        # Case-insensitive login / reset / registration lookups on lower(email).
+        # Not unique: existing case-variant duplicates must not block deploys.
+        Index('users_email_lower_idx', func.lower(email)),
+    )
 
 
 class AuditLog(Base):
     """Audit trail for user actions."""
     __tablename__ = "audit_logs"
-    id = Column(String, primary_key=True, default=generate_uuid)
+    id = Column(Uuid(as_uuid=False), primary_key=True, default=generate_uuid7)
     actor_id = Column(String, ForeignKey("users.id"))
     action = Column(String, nullable=False)
     target = Column(String, nullable=True)
@@ -60,11 +79,18 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    token = Column(String, nullable=False, unique=True)
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True, index=True)  # HMAC-SHA256 digest
     expires_at = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_revoked = Column(Boolean, default=False)
 
+    user = relationship("User")
+
+    # Active-sessions-per-user lookups (session cap, revoke-all)
+    __table_args__ = (
+        Index('ix_refresh_tokens_user_active', 'user_id', 'is_revoked', 'expires_at'),
+    )
+
 
 class LoginAttempt(Base):
     """Track login attempts for security."""
@@ -75,6 +101,14 @@ class LoginAttempt(Base):
     success = Column(Boolean, default=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    # Failed-login reports/alerts: range on timestamp, grouped by email
+    __table_args__ = (
+        Index(
+            'ix_login_attempts_failed_ts_email', 'timestamp', 'email',
+            postgresql_where=text('success = false'),
+        ),
+    )
+
 
 class EmailToken(Base):
     """
@@ -60,8 +60,11 @@ class RiskDecision(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, index=True)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    rule_evaluations = relationship("RuleEvaluation", back_populates="decision")
+    
     __table_args__ = (
         Index('ix_risk_decision_user_time', 'user_id', 'created_at'),
+        Index('ix_risk_decision_level_time', 'risk_level', 'created_at'),
     )
 
 
@@ -111,7 +114,7 @@ class RuleEvaluation(Base):
     __tablename__ = "rule_evaluations"
     
     id = Column(String(36), primary_key=True)
-    risk_decision_id = Column(String(36), ForeignKey('risk_decisions.id'), nullable=False)
+    risk_decision_id = Column(String(36), ForeignKey('risk_decisions.id'), nullable=False, index=True)
     
     # Rule info
     rule_id = Column(String(100), nullable=False)
@@ -127,6 +130,8 @@ class RuleEvaluation(Base):
     condition_values = Column(JSON, nullable=True)  # What values were checked
     
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    
+    decision = relationship("RiskDecision", back_populates="rule_evaluations")
 
 
 class DeviceFingerprint(Base):
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime
-import uuid
 
-from app.dependencies import require_role, require_permission, get_db
-from app.models import User, AuditLog
+from app.dependencies import require_role, require_permission, get_db, forget_cached_user
+from app.models import User, AuditLog, generate_uuid7
 from app.core.auth_utils import revoke_all_user_tokens
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -65,22 +64,22 @@ def disable_user(user_id: str, current_admin: User = Depends(require_role(["admi
     # Disable account
     user.is_active = False
     user.updated_at = datetime.utcnow()
-    db.commit()
     
-    # SECURITY: Revoke all tokens (immediate enforcement)
-    revoke_all_user_tokens(user_id, db)
+    # SECURITY: Revoke all tokens (immediate enforcement, same transaction)
+    revoked_ids = revoke_all_user_tokens(user_id, db, commit=False)
     
     # Audit log
     audit = AuditLog(
-        id=str(uuid.uuid4()),
+        id=generate_uuid7(),
         actor_id=current_admin.id,
         action="user_disabled",
         target=user_id,
-        event_metadata={"disabled_by": current_admin.email},
-        timestamp=datetime.utcnow()
+        event_metadata={"disabled_by": current_admin.email, "revoked_sessions": len(revoked_ids)},
+        timestamp=user.updated_at
     )
     db.add(audit)
     db.commit()
+    forget_cached_user(user.id)
     
     return {"msg": f"User {user.email} has been disabled"}
 
@@ -106,7 +105,7 @@ def enable_user(user_id: str, current_admin: User = Depends(require_role(["admin
     
     # Audit log
     audit = AuditLog(
-        id=str(uuid.uuid4()),
+        id=generate_uuid7(),
         actor_id=current_admin.id,
         action="user_enabled",
         target=user_id,
@@ -149,7 +148,7 @@ def change_user_role(
     
     # Audit log
     audit = AuditLog(
-        id=str(uuid.uuid4()),
+        id=generate_uuid7(),
         actor_id=current_admin.id,
         action="role_changed",
         target=user_id,
@@ -162,6 +161,7 @@ def change_user_role(
     )
     db.add(audit)
     db.commit()
+    forget_cached_user(user.id)
     
     return {
         "msg": f"User {user.email} role changed from {old_role} to {new_role}",
@@ -8,14 +8,19 @@ Marks user as email_verified=True.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, bindparam
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models import User, AuditLog
+from app.core.db import get_db
+from app.models import User
 from app.services.token_service import verify_email_token
+from app.services.audit_stream import audit_log
 from datetime import datetime
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+router = APIRouter(prefix="/auth", tags=["Authentication"], default_response_class=ORJSONResponse)
 
 
 @router.post("/verify-email")
@@ -37,7 +42,8 @@ def verify_email(
     email_token = verify_email_token(
         raw_token=token,
         purpose="email_verification",
-        db=db
+        db=db,
+        commit=False
     )
     
     if not email_token:
@@ -47,26 +53,20 @@ def verify_email(
         )
     
     # Get user
-    user = db.query(User).filter(User.id == email_token.user_id).first()
+    user = db.execute(_USER_BY_ID, {"user_id": email_token.user_id}).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Already verified?
     if user.email_verified:
+        db.commit()  # Still consume the token
         return {"msg": "Email already verified"}
     
     # Mark as verified
     user.email_verified = True
-    db.commit()
     
-    # Audit log
-    audit_log = AuditLog(
-        actor_id=user.id,
-        action="email_verified",
-        target=user.email,
-        event_metadata={"email": user.email}
-    )
-    db.add(audit_log)
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    audit_log(db, user.id, "email_verified", user.email, {"email": user.email})
     db.commit()
     
     return {"msg": "Email verified successfully"}
@@ -15,6 +15,7 @@ from app.dependencies import get_current_user
 from app.models.events import EventOutbox
 from app.services.redis_stream import get_redis_stream_manager
 from app.core.db import db_session
+from app.core.client_ip import get_client_ip
 import json
 
 logger = logging.getLogger("sentineliq.gateway")
@@ -46,7 +47,9 @@ async def ingest_event(
     
     try:
         # Enrich event with request context
-        event.actor.ip_address = request.client.host if request.client else event.actor.ip_address
+        client_ip = get_client_ip(request)
+        if client_ip != "unknown":
+            event.actor.ip_address = client_ip
         event.actor.user_agent = request.headers.get("user-agent", "unknown")
         event.timestamp = datetime.utcnow()
         
@@ -112,7 +115,7 @@ async def ingest_auth_event(
             event_type=event_data.get("event_type"),
             actor=ActorContext(
                 user_id=event_data.get("user_id"),
-                ip_address=request.client.host if request.client else "unknown",
+                ip_address=get_client_ip(request),
                 user_agent=request.headers.get("user-agent", "unknown"),
                 device_fingerprint=event_data.get("device_fingerprint", "unknown")
             ),
@@ -150,7 +153,7 @@ async def ingest_transaction_event(
             event_type=event_data.get("event_type"),
             actor=ActorContext(
                 user_id=event_data.get("user_id"),
-                ip_address=request.client.host if request.client else "unknown",
+                ip_address=get_client_ip(request),
                 user_agent=request.headers.get("user-agent", "unknown"),
                 device_fingerprint=event_data.get("device_fingerprint", "unknown")
             ),
@@ -7,10 +7,9 @@ Practical examples of implementing role-based access control in your routes.
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime
-import uuid
 
 from app.dependencies import require_role, require_permission, get_current_user, get_db
-from app.models import User, AuditLog
+from app.models import User, AuditLog, generate_uuid7
 from app.config import ROLES
 
 # Example 1: Basic role-based protection (single role)
@@ -144,7 +143,7 @@ def sensitive_admin_action(
     
     # Log the action for compliance
     audit = AuditLog(
-        id=str(uuid.uuid4()),
+        id=generate_uuid7(),
         actor_id=current_admin.id,
         action="sensitive_admin_action",
         target=target_id,
@@ -5,12 +5,14 @@ Provides flexible, client-controlled queries for risks, events, users, and analy
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_async_db
 from app.dependencies import get_db, require_role
 from app.models import User
 from app.core.logging import logger, log_event
 import strawberry
 from strawberry.fastapi import GraphQLRouter
-from app.graphql_schema import create_schema
+from app.graphql_schema import create_schema, create_context
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 
@@ -18,14 +20,11 @@ from typing import Optional, Dict, Any
 schema = create_schema()
 
 # Custom context function to inject db and user
-def get_context(
-    db: Session = Depends(get_db),
+async def get_context(
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(require_role(["admin"]))
 ):
-    return {
-        "db": db,
-        "user": user
-    }
+    return create_context(db, user)
 
 # Create GraphQL router
 graphql_app = GraphQLRouter(
@@ -78,6 +77,16 @@ def get_schema_docs(
                             riskScore
                             riskLevel
                             timestamp
+                            cursor
+                        }
+                    }
+                """,
+                "recent_events_next_page": """
+                    query {
+                        recentRiskEvents(limit: 10, before: "<cursor of the last event>") {
+                            eventId
+                            timestamp
+                            cursor
                         }
                     }
                 """,
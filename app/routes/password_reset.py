@@ -2,7 +2,7 @@
 Password Reset Routes (MILESTONE 6 - STEP 4)
 
 Endpoints:
-  POST /auth/password-reset/request?email=...
+  POST /auth/password-reset/request
   POST /auth/password-reset/confirm
 
 Handles secure password reset with single-use tokens.
@@ -10,30 +10,26 @@ Revokes all sessions on successful reset.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, bindparam
 from sqlalchemy.orm import Session
-from datetime import datetime
 
-from app.database import get_db
-from app.models import User, AuditLog, RefreshToken
+from app.core.db import get_db
+from app.core.timeutils import utc_now
+from app.models import User
+from app.schemas.auth import PasswordResetRequest, PasswordResetConfirm
 from app.services.token_service import generate_email_token, verify_email_token
 from app.services.email_service import send_email
 from app.services.template_service import render_template
-from app.core.security import hash_password
+from app.core.auth_utils import revoke_all_user_tokens, USER_BY_EMAIL, email_lookup_params
+from app.dependencies import forget_cached_user
+from app.core.security import hash_password, verify_password, DUMMY_PASSWORD_HASH
 from app.config import FRONTEND_BASE_URL
+from app.services.audit_stream import audit_log
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
 
-
-class PasswordResetRequest(BaseModel):
-    """Request password reset by email."""
-    email: EmailStr
-
-
-class PasswordResetConfirm(BaseModel):
-    """Confirm password reset with token."""
-    token: str
-    new_password: str
+router = APIRouter(prefix="/auth", tags=["Authentication"], default_response_class=ORJSONResponse)
 
 
 @router.post("/password-reset/request")
@@ -44,7 +40,7 @@ def request_password_reset(
     """
     Request password reset token via email.
     
-    Query Parameters:
+    Request Body:
         email: User email address
     
     Security:
@@ -55,7 +51,7 @@ def request_password_reset(
     Returns:
         Always: {"msg": "If email exists, a reset link has been sent"}
     """
-    user = db.query(User).filter(User.email == payload.email).first()
+    user = db.execute(USER_BY_EMAIL, email_lookup_params(payload.email)).scalar_one_or_none()
     
     # Anti-enumeration: Don't reveal if email exists
     if user:
@@ -63,9 +59,14 @@ def request_password_reset(
         token = generate_email_token(
             user_id=user.id,
             purpose="password_reset",
-            db=db
+            db=db,
+            commit=False
         )
         
+        # Audit log (streamed; lands in this transaction if Redis is down)
+        audit_log(db, user.id, "password_reset_requested", user.email, {"email": user.email})
+        db.commit()
+        
         # Render email template
         reset_url = f"{FRONTEND_BASE_URL}/reset-password?token={token}"
         html = render_template(
@@ -82,16 +83,9 @@ def request_password_reset(
             subject="Reset your SentinelIQ password",
             html_content=html
         )
-        
-        # Audit log
-        audit_log = AuditLog(
-            actor_id=user.id,
-            action="password_reset_requested",
-            target=user.email,
-            event_metadata={"email": user.email}
-        )
-        db.add(audit_log)
-        db.commit()
+    else:
+        # Burn comparable CPU so response time doesn't reveal unknown emails
+        verify_password(payload.email, DUMMY_PASSWORD_HASH)
     
     # Always return same response (prevent enumeration)
     return {"msg": "If the email exists, a reset link has been sent"}
@@ -123,7 +117,8 @@ def confirm_password_reset(
     email_token = verify_email_token(
         raw_token=payload.token,
         purpose="password_reset",
-        db=db
+        db=db,
+        commit=False
     )
     
     if not email_token:
@@ -133,34 +128,25 @@ def confirm_password_reset(
         )
     
     # Get user
-    user = db.query(User).filter(User.id == email_token.user_id).first()
+    user = db.execute(_USER_BY_ID, {"user_id": email_token.user_id}).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    now = utc_now()
+    
     # Update password (bcrypt hashed)
     user.password_hash = hash_password(payload.new_password)
-    user.updated_at = datetime.utcnow()
-    db.commit()
+    user.updated_at = now
     
-    # SECURITY: Revoke ALL refresh tokens (all devices must re-login)
-    tokens_to_revoke = db.query(RefreshToken).filter(
-        RefreshToken.user_id == user.id,
-        RefreshToken.is_revoked == False
-    ).all()
-    
-    for token in tokens_to_revoke:
-        token.is_revoked = True
-    
-    db.commit()
+    # SECURITY: Revoke ALL refresh tokens (all devices must re-login) in one UPDATE
+    revoked_ids = revoke_all_user_tokens(user.id, db, commit=False)
     
-    # Audit log
-    audit_log = AuditLog(
-        actor_id=user.id,
-        action="password_reset_completed",
-        target=user.email,
-        event_metadata={"email": user.email}
+    # Audit log (streamed; lands in this transaction if Redis is down)
+    audit_log(
+        db, user.id, "password_reset_completed", user.email,
+        {"email": user.email, "revoked_sessions": len(revoked_ids)}, now=now
     )
-    db.add(audit_log)
     db.commit()
+    forget_cached_user(user.id)
     
     return {"msg": "Password reset successful. Please login with your new password."}
@@ -1,19 +1,23 @@
 # app/routes/users.py
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, func, bindparam
 from sqlalchemy.orm import Session
 from datetime import datetime
-import uuid
 
 from app.dependencies import get_current_user, get_db
 from app.schemas.user import UserCreate, UserOut
-from app.models import User, AuditLog
+from app.models import User, AuditLog, generate_uuid7
 from app.core.security import hash_password
+from app.core.auth_utils import normalize_email
 from app.services.token_service import generate_email_token
 from app.services.email_service import send_email
 from app.services.template_service import render_template
 from app.config import FRONTEND_BASE_URL
 
-router = APIRouter(prefix="/users", tags=["users"])
+_USER_ID_BY_EMAIL = select(User.id).where(func.lower(User.email) == bindparam("email"))
+
+router = APIRouter(prefix="/users", tags=["users"], default_response_class=ORJSONResponse)
 
 
 @router.post("/", response_model=UserOut)
@@ -22,7 +26,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     Register new user.
     Email verification required before API access.
     """
-    existing = db.query(User).filter(User.email == user.email).first()
+    existing = db.execute(_USER_ID_BY_EMAIL, {"email": normalize_email(user.email)}).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already exists")
 
@@ -36,44 +40,47 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()  # INSERT now; id/defaults are set client-side, no SELECT back
     
-    # MILESTONE 6: Send verification email with token
+    # MILESTONE 6: Verification token in the same transaction
     verification_token = generate_email_token(
         user_id=db_user.id,
         purpose="email_verification",
-        db=db
+        db=db,
+        commit=False
     )
     
-    # Render and send verification email
+    # Audit log
+    audit = AuditLog(
+        id=generate_uuid7(),
+        actor_id=db_user.id,
+        action="user_registered",
+        target=db_user.id,
+        event_metadata={"email": db_user.email},
+        timestamp=datetime.utcnow()
+    )
+    db.add(audit)
+    
+    # Serialize before commit so expired attributes don't trigger a reload
+    response = UserOut.model_validate(db_user)
+    db.commit()
+    
+    # Render and send verification email (after the token is durable)
     verification_url = f"{FRONTEND_BASE_URL}/verify-email?token={verification_token}"
     html = render_template(
         "email_verification.html",
         {
-            "first_name": db_user.first_name,
+            "first_name": response.first_name,
             "verification_url": verification_url,
         }
     )
     send_email(
-        to=db_user.email,
+        to=response.email,
         subject="Verify your SentinelIQ account",
         html_content=html
     )
     
-    # Audit log
-    audit = AuditLog(
-        id=str(uuid.uuid4()),
-        actor_id=db_user.id,
-        action="user_registered",
-        target=db_user.id,
-        event_metadata={"email": db_user.email},
-        timestamp=datetime.utcnow()
-    )
-    db.add(audit)
-    db.commit()
-    
-    return db_user
+    return response
 
 
 @router.get("/me", response_model=UserOut)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -14,3 +14,16 @@ class RefreshTokenRequest(BaseModel):
 
 class LogoutRequest(BaseModel):
     refresh_token: str
+
+class PasswordResetRequest(BaseModel):
+    """Request password reset by email."""
+    email: EmailStr
+
+class PasswordResetConfirm(BaseModel):
+    """Confirm password reset with token."""
+    token: str = Field(min_length=1, max_length=128)
+    new_password: str = Field(
+        min_length=8,
+        max_length=72,
+        description="Password must be between 8 and 72 characters"
+    )
@@ -9,11 +9,13 @@ from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_, or_, between, case
 from collections import defaultdict
+from functools import lru_cache
 
 from app.models import User, AuditLog
 from app.models.events import RiskDecision, RuleEvaluation, VelocityCounter
 from app.core.logging import logger
 from app.core.db import SessionLocal
+from app.services.bulk_fetch import decisions_by_user_ids
 
 
 class AdvancedAnalyticsService:
@@ -383,14 +385,11 @@ class AdvancedAnalyticsService:
         Useful for identifying similar patterns or anomalies
         """
         cutoff = datetime.utcnow() - timedelta(days=days)
+        # Both users' decisions in one query
+        decisions_by_user = decisions_by_user_ids(db, (user_id_a, user_id_b), since=cutoff)
         
         def get_user_profile(user_id):
-            decisions = db.query(RiskDecision).filter(
-                and_(
-                    RiskDecision.user_id == user_id,
-                    RiskDecision.created_at >= cutoff
-                )
-            ).all()
+            decisions = decisions_by_user[user_id]
             
             if not decisions:
                 return None
@@ -521,25 +520,23 @@ class AdvancedAnalyticsService:
         
         rule_metrics = {}
         
-        # Get all unique rules
-        rules = db.query(RuleEvaluation.rule_name).distinct().filter(
+        # One GROUP BY over all rules instead of loading every evaluation per
+        # rule. rule_evaluations has no ground-truth label; a trigger counts as
+        # a true positive when the event's final decision was a block.
+        rows = db.query(
+            RuleEvaluation.rule_name,
+            func.count().label("total"),
+            func.sum(case((RuleEvaluation.matched, 1), else_=0)).label("triggered"),
+            func.sum(case((and_(RuleEvaluation.matched, RiskDecision.decision == "block"), 1), else_=0)).label("true_positives")
+        ).join(
+            RiskDecision, RiskDecision.id == RuleEvaluation.risk_decision_id
+        ).filter(
             RuleEvaluation.created_at >= cutoff
-        ).all()
+        ).group_by(RuleEvaluation.rule_name).all()
         
-        for (rule_name,) in rules:
-            evals = db.query(RuleEvaluation).filter(
-                and_(
-                    RuleEvaluation.rule_name == rule_name,
-                    RuleEvaluation.created_at >= cutoff
-                )
-            ).all()
-            
-            triggered = sum(1 for e in evals if e.triggered)
-            total = len(evals)
-            
-            # Get outcomes for triggered events
-            true_positives = sum(1 for e in evals 
-                                if e.triggered and e.is_true_positive)
+        for rule_name, total, triggered, true_positives in rows:
+            triggered = triggered or 0
+            true_positives = true_positives or 0
             false_positives = triggered - true_positives
             
             precision = (true_positives / triggered) if triggered > 0 else 0
@@ -564,13 +561,7 @@ class AdvancedAnalyticsService:
         }
 
 
-# Singleton instance
-_advanced_analytics_service = None
-
-
+@lru_cache(maxsize=1)
 def get_advanced_analytics_service() -> AdvancedAnalyticsService:
     """Get or create singleton instance"""
-    global _advanced_analytics_service
-    if _advanced_analytics_service is None:
-        _advanced_analytics_service = AdvancedAnalyticsService()
-    return _advanced_analytics_service
+    return AdvancedAnalyticsService()
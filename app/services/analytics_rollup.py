@@ -0,0 +1,175 @@
+# Analytics Rollup
+# Dashboard totals (analyticsSummary) come from risk_daily_rollup, a
+# materialized view with one row per (day, risk_level), instead of scanning
+# every risk decision in the window on each refresh. A background task
+# refreshes it concurrently every few minutes. The view is Postgres-only;
+# on other databases (the default SQLite DATABASE_URL) ROLLUP_SUPPORTED is
+# False and callers aggregate risk_decisions live instead.
+
+import logging
+import asyncio
+from datetime import date, timedelta
+from typing import Optional
+from sqlalchemy import bindparam, column, func, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import AsyncSessionLocal, async_engine
+from app.core.timeutils import utc_now
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SUPPORTED = async_engine.dialect.name == "postgresql"
+
+# Same DDL as migrations/009_risk_daily_rollup.sql; executed at startup so
+# create_all-bootstrapped databases get the view too (IF NOT EXISTS = no-op)
+_CREATE_ROLLUP = text("""
+CREATE MATERIALIZED VIEW IF NOT EXISTS risk_daily_rollup AS
+SELECT
+    (created_at AT TIME ZONE 'UTC')::date AS day,
+    risk_level,
+    count(*) AS events,
+    sum(risk_score) AS score_sum,
+    count(*) FILTER (WHERE recommended_action = 'block') AS blocks
+FROM risk_decisions
+GROUP BY 1, 2
+""")
+# REFRESH ... CONCURRENTLY requires a unique index on the view
+_CREATE_ROLLUP_INDEX = text(
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_risk_daily_rollup_day_level "
+    "ON risk_daily_rollup (day, risk_level)"
+)
+_REFRESH_ROLLUP = text("REFRESH MATERIALIZED VIEW CONCURRENTLY risk_daily_rollup")
+
+# Every uvicorn worker runs the refresher; the transaction-scoped advisory
+# lock lets exactly one of them refresh per interval.
+_REFRESH_LOCK_KEY = 0x5E1A_0001
+_TRY_REFRESH_LOCK = text("SELECT pg_try_advisory_xact_lock(:key)").bindparams(key=_REFRESH_LOCK_KEY)
+_WAIT_REFRESH_LOCK = text("SELECT pg_advisory_xact_lock(:key)").bindparams(key=_REFRESH_LOCK_KEY)
+
+# Not an ORM model: the view must stay out of Base.metadata / create_all
+risk_daily_rollup = table(
+    "risk_daily_rollup",
+    column("day"),
+    column("risk_level"),
+    column("events"),
+    column("score_sum"),
+    column("blocks"),
+)
+
+_SUMMARY_STMT = select(
+    risk_daily_rollup.c.risk_level,
+    func.sum(risk_daily_rollup.c.events).label("count"),
+    func.sum(risk_daily_rollup.c.score_sum).label("score_sum"),
+    func.sum(risk_daily_rollup.c.blocks).label("blocks")
+).where(
+    risk_daily_rollup.c.day >= bindparam("since")
+).group_by(risk_daily_rollup.c.risk_level)
+
+
+def rollup_since(days: int) -> date:
+    """First UTC day included in a `days`-day rollup window."""
+    return (utc_now() - timedelta(days=days)).date()
+
+
+async def rollup_summary(db: AsyncSession, since: date) -> dict:
+    """
+    Risk-level breakdown since the start of `since` (UTC), read from the
+    rollup: at most 4 rows per day in the window instead of every decision.
+    Lags live data by up to REFRESH_INTERVAL_SECONDS.
+    """
+    counts = {}
+    total = blocks = 0
+    score_sum = 0.0
+    for row in (await db.execute(_SUMMARY_STMT, {"since": since})).all():
+        counts[row.risk_level] = int(row.count)
+        total += int(row.count)
+        score_sum += row.score_sum or 0.0
+        blocks += int(row.blocks or 0)
+    return {
+        "counts": counts,
+        "total": total,
+        "average": (score_sum / total) if total else 0.0,
+        "blocks": blocks,
+    }
+
+
+# ========== REFRESHER ==========
+
+class RollupRefresher:
+    """
+    Background task that keeps risk_daily_rollup current.
+
+    Refresh: every REFRESH_INTERVAL_SECONDS, CONCURRENTLY (readers never block)
+    Only the worker holding the advisory lock refreshes; the rest skip.
+    """
+
+    REFRESH_INTERVAL_SECONDS = 300
+
+    def __init__(self):
+        self.running = False
+
+    async def start(self):
+        """Create the view if missing, then refresh it on an interval."""
+        self.running = True
+        logger.info("[ROLLUP] Starting...")
+        try:
+            await self._ensure_view()
+        except Exception as e:
+            logger.error(f"[ROLLUP] Failed to create risk_daily_rollup: {e}", exc_info=True)
+
+        while self.running:
+            await asyncio.sleep(self.REFRESH_INTERVAL_SECONDS)
+            try:
+                await self._refresh()
+            except Exception as e:
+                logger.error(f"[ROLLUP] Error refreshing risk_daily_rollup: {e}", exc_info=True)
+
+    async def stop(self):
+        """Stop the refresher."""
+        self.running = False
+        logger.info("[ROLLUP] Stopping...")
+
+    async def _ensure_view(self):
+        async with AsyncSessionLocal() as db:
+            # Workers boot together; concurrent IF NOT EXISTS can still collide
+            await db.execute(_WAIT_REFRESH_LOCK)
+            await db.execute(_CREATE_ROLLUP)
+            await db.execute(_CREATE_ROLLUP_INDEX)
+            await db.commit()
+
+    async def _refresh(self):
+        async with AsyncSessionLocal() as db:
+            if not (await db.execute(_TRY_REFRESH_LOCK)).scalar():
+                return
+            await db.execute(_REFRESH_ROLLUP)
+            await db.commit()
+        logger.debug("[ROLLUP] Refreshed risk_daily_rollup")
+
+
+# ========== INITIALIZATION ==========
+
+_refresher_instance: Optional[RollupRefresher] = None
+
+
+async def initialize_rollup_refresher():
+    """Initialize and start the rollup refresher on application startup."""
+    global _refresher_instance
+
+    if not ROLLUP_SUPPORTED:
+        logger.info("[ROLLUP] Not on PostgreSQL; analytics summaries are aggregated live")
+        return
+
+    _refresher_instance = RollupRefresher()
+
+    # Start as background task
+    asyncio.create_task(_refresher_instance.start())
+
+    logger.info("[ROLLUP] Refresher initialized and started")
+
+
+async def shutdown_rollup_refresher():
+    """Shutdown the rollup refresher on application shutdown."""
+    global _refresher_instance
+
+    if _refresher_instance:
+        await _refresher_instance.stop()
+        logger.info("[ROLLUP] Refresher shutdown complete")
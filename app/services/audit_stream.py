@@ -0,0 +1,340 @@
+# Audit Stream
+# Auth handlers append audit records (audit logs, login attempts) to a Redis
+# stream; a background consumer drains it into Postgres in batches so request
+# paths never wait on an INSERT + COMMIT.
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple, Dict, Any
+import orjson
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+from app.config import AUDIT_DEAD_LETTER_STREAM_NAME, AUDIT_STREAM_NAME, LOGIN_ATTEMPT_RETENTION_DAYS
+from app.core.db import AsyncSessionLocal
+from app.core.timeutils import utc_now
+from app.models import AuditLog, LoginAttempt, generate_uuid7
+from app.services.redis_stream import get_async_redis, get_redis_stream_manager
+
+logger = logging.getLogger(__name__)
+
+AUDIT_STREAM_MAXLEN = 1_000_000
+
+
+# ========== AUDIT WRITER ==========
+
+def _audit_entry(actor_id: Optional[str], action: str, target: Optional[str], metadata: Optional[Dict[str, Any]], now: Optional[datetime]) -> Dict[str, str]:
+    """Flatten an audit record into stream fields (Redis values are strings)."""
+    return {
+        "type": "audit_log",
+        "id": generate_uuid7(),
+        "actor_id": actor_id or "",
+        "action": action,
+        "target": target or "",
+        "metadata": orjson.dumps(metadata or {}, option=orjson.OPT_NON_STR_KEYS).decode(),
+        "timestamp": (now or utc_now()).isoformat(),
+    }
+
+
+def _fallback_to_session(db, entry: Dict[str, str]):
+    """Redis unavailable: stage the row on the caller's session instead of dropping it."""
+    db.add(AuditLog(
+        id=entry["id"],
+        actor_id=entry["actor_id"] or None,
+        action=entry["action"],
+        target=entry["target"] or None,
+        event_metadata=orjson.loads(entry["metadata"]),
+        timestamp=datetime.fromisoformat(entry["timestamp"]),
+    ))
+
+
+async def audit_log_async(db, actor_id: Optional[str], action: str, target: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None, now: Optional[datetime] = None):
+    """
+    Append an audit record to the audit stream (async endpoints).
+    
+    If Redis is down the row is added to db instead and persists with the
+    caller's next commit, so audit records are never silently lost.
+    """
+    entry = _audit_entry(actor_id, action, target, metadata, now)
+    try:
+        await get_async_redis().xadd(AUDIT_STREAM_NAME, entry, maxlen=AUDIT_STREAM_MAXLEN, approximate=True)
+    except Exception as e:
+        logger.warning(f"[AUDIT] Stream unavailable, writing audit log inline: {e}")
+        _fallback_to_session(db, entry)
+
+
+def audit_log(db: Session, actor_id: Optional[str], action: str, target: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None, now: Optional[datetime] = None) -> bool:
+    """
+    Sync counterpart of audit_log_async for sync endpoints.
+    
+    Returns False when the row was staged on db instead (caller must commit).
+    """
+    entry = _audit_entry(actor_id, action, target, metadata, now)
+    try:
+        get_redis_stream_manager().redis.xadd(AUDIT_STREAM_NAME, entry, maxlen=AUDIT_STREAM_MAXLEN, approximate=True)
+        return True
+    except Exception as e:
+        logger.warning(f"[AUDIT] Stream unavailable, writing audit log inline: {e}")
+        _fallback_to_session(db, entry)
+        return False
+
+
+# ========== AUDIT CONSUMER ==========
+
+# Idempotent inserts: an entry persisted but not yet XACKed (crash, Redis blip)
+# is delivered again, and the replay must not fail on its own primary key
+_INSERT_AUDIT_LOGS = pg_insert(AuditLog).on_conflict_do_nothing(index_elements=[AuditLog.id])
+_INSERT_LOGIN_ATTEMPTS = pg_insert(LoginAttempt).on_conflict_do_nothing(index_elements=[LoginAttempt.id])
+
+
+def _is_transient(exc: Exception) -> bool:
+    """Infrastructure failure (retry later) rather than a row that can never insert."""
+    return (
+        isinstance(exc, (OperationalError, InterfaceError, RedisError, OSError))
+        or getattr(exc, "connection_invalidated", False)
+    )
+
+
+class AuditStreamConsumer:
+    """
+    Background worker that reads the audit stream as a consumer group and
+    bulk-inserts the entries.
+
+    Batch size: 1000 entries per read (one multi-row INSERT per batch)
+    Block: up to 1 second waiting for new entries
+    Entries are only XACKed after their batch commits (at-least-once):
+    - this consumer's own pending entries are re-read on start and after any
+      error (XREADGROUP from "0");
+    - entries another consumer left pending for CLAIM_MIN_IDLE_MS (worker
+      died mid-batch) are taken over with XAUTOCLAIM;
+    - a batch that fails on its data is retried row by row, and rows that
+      still fail go to the dead-letter stream instead of blocking the rest.
+    As the only writer of login_attempts it also prunes rows older than
+    LOGIN_ATTEMPT_RETENTION_DAYS, at most once per PRUNE_INTERVAL_SECONDS.
+    """
+
+    GROUP_NAME = "audit-writer"
+    BATCH_SIZE = 1000
+    BLOCK_MS = 1000
+    ERROR_BACKOFF_SECONDS = 1
+    PRUNE_INTERVAL_SECONDS = 3600
+    CLAIM_INTERVAL_SECONDS = 30
+    CLAIM_MIN_IDLE_MS = 60_000
+
+    def __init__(self, consumer_name: Optional[str] = None):
+        # One consumer per process: workers sharing a name would share (and
+        # never tell apart) each other's pending entries
+        self.consumer_name = consumer_name or f"audit-writer-{socket.gethostname()}-{os.getpid()}"
+        self.running = False
+        self._last_prune = 0.0
+        self._last_claim = 0.0
+        self._claim_cursor = "0-0"
+        self._drain_pending = True
+
+    async def start(self):
+        """Start the consumer background task."""
+        self.running = True
+        logger.info("[AUDIT CONSUMER] Starting...")
+        await self._ensure_group()
+
+        while self.running:
+            try:
+                if self._drain_pending:
+                    await self._drain_own_pending()
+                await self._maybe_claim_stale()
+                await self._consume_cycle()
+                await self._maybe_prune()
+            except Exception as e:
+                logger.error(f"[AUDIT CONSUMER] Error in consume cycle: {e}", exc_info=True)
+                # Whatever was in flight is still pending; re-read it next round
+                self._drain_pending = True
+                await asyncio.sleep(self.ERROR_BACKOFF_SECONDS)
+
+    async def stop(self):
+        """Stop the consumer."""
+        self.running = False
+        logger.info("[AUDIT CONSUMER] Stopping...")
+
+    async def _ensure_group(self):
+        """Create the consumer group (and stream) if missing."""
+        try:
+            await get_async_redis().xgroup_create(
+                AUDIT_STREAM_NAME, self.GROUP_NAME, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _consume_cycle(self):
+        """Single cycle: read a batch of new entries, insert it, ack it."""
+        response = await get_async_redis().xreadgroup(
+            groupname=self.GROUP_NAME,
+            consumername=self.consumer_name,
+            streams={AUDIT_STREAM_NAME: ">"},
+            count=self.BATCH_SIZE,
+            block=self.BLOCK_MS,
+        )
+        if response:
+            await self._handle(response[0][1])
+
+    async def _drain_own_pending(self):
+        """Re-process entries delivered to this consumer but never acked."""
+        redis = get_async_redis()
+        while True:
+            response = await redis.xreadgroup(
+                groupname=self.GROUP_NAME,
+                consumername=self.consumer_name,
+                streams={AUDIT_STREAM_NAME: "0"},
+                count=self.BATCH_SIZE,
+            )
+            messages = response[0][1] if response else []
+            if not messages:
+                break
+            # Acks (or raises on a transient failure), so this terminates
+            await self._handle(messages)
+        self._drain_pending = False
+
+    async def _maybe_claim_stale(self):
+        """Take over entries left pending by consumers that died or stalled."""
+        if time.monotonic() - self._last_claim < self.CLAIM_INTERVAL_SECONDS:
+            return
+        self._last_claim = time.monotonic()
+
+        response = await get_async_redis().xautoclaim(
+            AUDIT_STREAM_NAME,
+            self.GROUP_NAME,
+            self.consumer_name,
+            min_idle_time=self.CLAIM_MIN_IDLE_MS,
+            start_id=self._claim_cursor,
+            count=self.BATCH_SIZE,
+        )
+        # Cursor comes back as "0-0" once the whole pending list was scanned
+        self._claim_cursor = response[0]
+        messages = response[1]
+        if messages:
+            logger.warning(f"[AUDIT CONSUMER] Claimed {len(messages)} stale pending entries")
+            await self._handle(messages)
+
+    async def _handle(self, messages: List[Tuple[str, Dict[str, str]]]):
+        """
+        Persist a batch, then ack it.
+
+        A data failure (bad field, constraint violation) falls back to one
+        transaction per row so a single poison entry can't hold back the
+        batch; transient DB/Redis failures propagate and leave the whole
+        batch pending for the next drain.
+        """
+        # Entries trimmed from the stream before being read come back empty
+        live = [(msg_id, data) for msg_id, data in messages if data]
+        try:
+            if live:
+                await self._persist(live)
+        except Exception as e:
+            if _is_transient(e):
+                raise
+            logger.warning(f"[AUDIT CONSUMER] Batch of {len(live)} failed ({e}); retrying row by row")
+            for message in live:
+                await self._persist_or_dead_letter(message)
+
+        await get_async_redis().xack(AUDIT_STREAM_NAME, self.GROUP_NAME, *[msg_id for msg_id, _ in messages])
+        logger.debug(f"[AUDIT CONSUMER] Persisted {len(live)} audit entries")
+
+    async def _persist_or_dead_letter(self, message: Tuple[str, Dict[str, str]]):
+        msg_id, data = message
+        try:
+            await self._persist([message])
+        except Exception as e:
+            if _is_transient(e):
+                raise
+            await get_async_redis().xadd(
+                AUDIT_DEAD_LETTER_STREAM_NAME,
+                {**data, "source_id": msg_id, "error": repr(e)[:1000]},
+                maxlen=AUDIT_STREAM_MAXLEN,
+                approximate=True,
+            )
+            logger.error(f"[AUDIT CONSUMER] Dead-lettered entry {msg_id}: {e}")
+
+    async def _persist(self, messages: List[Tuple[str, Dict[str, str]]]):
+        """
+        Insert one batch of stream entries in a single transaction.
+
+        Plain dicts through ORM bulk INSERT (one executemany per table), not
+        add_all(): no per-row identity-map/unit-of-work bookkeeping. ON CONFLICT
+        DO NOTHING makes redelivered entries a no-op.
+        """
+        audit_rows = []
+        login_rows = []
+        for _, data in messages:
+            if data.get("type") == "audit_log":
+                audit_rows.append({
+                    "id": data["id"],
+                    "actor_id": data.get("actor_id") or None,
+                    "action": data["action"],
+                    "target": data.get("target") or None,
+                    "event_metadata": orjson.loads(data.get("metadata") or "{}"),
+                    "timestamp": datetime.fromisoformat(data["timestamp"]),
+                })
+            elif data.get("type") == "login_attempt":
+                login_rows.append({
+                    "id": data["id"],
+                    "email": data["email"],
+                    "ip_address": data.get("ip_address") or None,
+                    "success": data.get("success") == "1",
+                    "timestamp": datetime.fromisoformat(data["timestamp"]),
+                })
+
+        if not audit_rows and not login_rows:
+            return
+
+        async with AsyncSessionLocal() as db:
+            if audit_rows:
+                await db.execute(_INSERT_AUDIT_LOGS, audit_rows)
+            if login_rows:
+                await db.execute(_INSERT_LOGIN_ATTEMPTS, login_rows)
+            await db.commit()
+
+    async def _maybe_prune(self):
+        """Delete login attempts past retention (cheap no-op between intervals)."""
+        if time.monotonic() - self._last_prune < self.PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = time.monotonic()
+
+        cutoff = utc_now() - timedelta(days=LOGIN_ATTEMPT_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(LoginAttempt).where(LoginAttempt.timestamp < cutoff)
+            )
+            await db.commit()
+        logger.info(f"[AUDIT CONSUMER] Pruned {result.rowcount} login attempts older than {cutoff}")
+
+
+# ========== INITIALIZATION ==========
+
+_consumer_instance: Optional[AuditStreamConsumer] = None
+
+
+async def initialize_audit_consumer():
+    """Initialize and start the audit consumer on application startup."""
+    global _consumer_instance
+
+    _consumer_instance = AuditStreamConsumer()
+
+    # Start as background task
+    asyncio.create_task(_consumer_instance.start())
+
+    logger.info("[AUDIT CONSUMER] Consumer initialized and started")
+
+
+async def shutdown_audit_consumer():
+    """Shutdown the audit consumer on application shutdown."""
+    global _consumer_instance
+
+    if _consumer_instance:
+        await _consumer_instance.stop()
+        logger.info("[AUDIT CONSUMER] Consumer shutdown complete")
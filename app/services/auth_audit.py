@@ -1,11 +1,10 @@
-from app.models import AuditLog
+from app.models import AuditLog, generate_uuid7
 from sqlalchemy.orm import Session
 from datetime import datetime
-import uuid
 
 def log_auth_attempt(user_id: str, action: str, db: Session, success: bool, metadata: dict = {}):
     log = AuditLog(
-        id=str(uuid.uuid4()),
+        id=generate_uuid7(),
         actor_id=user_id,
         action=action,
         target=user_id,
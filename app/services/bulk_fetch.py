@@ -0,0 +1,47 @@
+"""
+Bulk ORM lookups: one `WHERE ... IN (...)` query per batch of keys instead of
+one query per key. Used by the GraphQL DataLoaders; usable anywhere a loop
+would otherwise fetch rows one id at a time.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session, raiseload
+
+from app.models import User
+from app.models.events import RiskDecision, RuleEvaluation
+
+
+def users_by_ids(db: Session, ids: Iterable[str]) -> Dict[str, User]:
+    """id -> User for the given ids (missing ids are simply absent)."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    users = db.query(User).options(raiseload("*")).filter(User.id.in_(ids))
+    return {user.id: user for user in users}
+
+
+def rule_evaluations_by_decision_ids(db: Session, decision_ids: Iterable[str]) -> Dict[str, List[RuleEvaluation]]:
+    """risk_decision_id -> its RuleEvaluations (empty list for ids with none)."""
+    grouped = {decision_id: [] for decision_id in decision_ids}
+    if not grouped:
+        return grouped
+    rules = db.query(RuleEvaluation).options(raiseload("*")).filter(
+        RuleEvaluation.risk_decision_id.in_(list(grouped))
+    )
+    for rule in rules:
+        grouped[rule.risk_decision_id].append(rule)
+    return grouped
+
+
+def decisions_by_user_ids(db: Session, user_ids: Iterable[str], since: Optional[datetime] = None) -> Dict[str, List[RiskDecision]]:
+    """user_id -> that user's RiskDecisions (created at/after since, if given)."""
+    grouped = {user_id: [] for user_id in user_ids}
+    if not grouped:
+        return grouped
+    query = db.query(RiskDecision).options(raiseload("*")).filter(RiskDecision.user_id.in_(list(grouped)))
+    if since is not None:
+        query = query.filter(RiskDecision.created_at >= since)
+    for decision in query:
+        grouped[decision.user_id].append(decision)
+    return grouped
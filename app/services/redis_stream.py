@@ -5,19 +5,39 @@ Implements consumer groups for guaranteed event processing.
 
 import json
 import logging
+import socket
 from typing import Optional, Dict, Any, List
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from redis.exceptions import ResponseError
-from app.config import REDIS_URL
+from app.config import REDIS_URL, REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT, REDIS_SOCKET_CONNECT_TIMEOUT
 
 logger = logging.getLogger("sentineliq.redis_streams")
 
+# TCP keepalive on pooled sockets so idle connections survive NAT/LB idle
+# timeouts instead of failing (and reconnecting) on the next command.
+# The tuning constants are Linux-only; elsewhere keepalive uses OS defaults.
+_KEEPALIVE_OPTIONS = {
+    getattr(socket, name): value
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+}
+_CLIENT_OPTIONS = dict(
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    socket_keepalive=True,
+    socket_keepalive_options=_KEEPALIVE_OPTIONS,
+    health_check_interval=30,
+)
+
 
 class RedisStreamManager:
     """Manages Redis Stream operations for event ingestion and processing."""
     
     def __init__(self, redis_url: str = REDIS_URL):
-        self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.redis = Redis.from_url(redis_url, **_CLIENT_OPTIONS)
         
         # Stream names
         self.event_stream = "sentineliq:events"
@@ -28,6 +48,10 @@ class RedisStreamManager:
         self.event_consumer_group = "risk-engine"
         self.alert_consumer_group = "alerting"
         
+    def get_redis(self) -> Redis:
+        """Underlying sync Redis client (shared connection pool)."""
+        return self.redis
+    
     def ensure_consumer_groups(self):
         """Create consumer groups if they don't exist."""
         try:
@@ -252,6 +276,17 @@ def get_redis_stream_manager() -> RedisStreamManager:
     return _redis_stream_manager
 
 
+_async_redis: Optional[AsyncRedis] = None
+
+
+def get_async_redis() -> AsyncRedis:
+    """Get or create the shared asyncio Redis client (for async endpoints)."""
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = AsyncRedis.from_url(REDIS_URL, **_CLIENT_OPTIONS)
+    return _async_redis
+
+
 async def publish_to_stream(
     stream: str,
     message: Dict[str, Any],
@@ -24,7 +24,8 @@ def generate_email_token(
     user_id: str,
     purpose: str,
     db: Session,
-    expires_minutes: int = None
+    expires_minutes: int = None,
+    commit: bool = True
 ) -> str:
     """
     Generate a secure email token (for verification or password reset).
@@ -34,6 +35,7 @@ def generate_email_token(
         purpose: "email_verification" | "password_reset"
         db: Database session
         expires_minutes: Custom expiration (uses config default if None)
+        commit: Commit immediately (False leaves it in the caller's transaction)
     
     Returns:
         Raw token (returned ONLY once - must save immediately)
@@ -69,7 +71,8 @@ def generate_email_token(
     )
     
     db.add(db_token)
-    db.commit()
+    if commit:
+        db.commit()
     
     return raw_token  # Return raw token only
 
@@ -78,7 +81,8 @@ def verify_email_token(
     *,
     raw_token: str,
     purpose: str,
-    db: Session
+    db: Session,
+    commit: bool = True
 ) -> EmailToken | None:
     """
     Verify and consume an email token.
@@ -97,6 +101,7 @@ def verify_email_token(
         raw_token: Raw token from user
         purpose: Expected purpose
         db: Database session
+        commit: Commit immediately (False leaves it in the caller's transaction)
     
     Returns:
         EmailToken object if valid, None if invalid/expired/used
@@ -116,11 +121,14 @@ def verify_email_token(
         .first()
     )
     
+    # The indexed equality lookup on the digest is the comparison; only the
+    # SHA-256 of the raw token is ever compared, never the token itself
     if not token:
         return None
     
     # Mark as used (enforce single-use)
     token.is_used = True
-    db.commit()
+    if commit:
+        db.commit()
     
     return token
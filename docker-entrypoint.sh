@@ -0,0 +1,12 @@
+#!/bin/sh
+set -e
+
+# Multiprocess metrics live in per-pid files that outlive the workers; start
+# each container with an empty directory so a restart doesn't resurrect the
+# previous run's counters and gauges.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
@@ -0,0 +1,9 @@
+-- Migration: Case-insensitive lookup index on users.email
+-- Date: 2026-10-16
+-- Purpose: Index login / password-reset / registration lookups on lower(email)
+
+-- Deliberately not UNIQUE: databases may already hold case-variant duplicates
+-- (e.g. Bob@x.com and bob@x.com), which would make a unique index fail to
+-- build. Registration rejects new case variants; lookups prefer the exact
+-- spelling when duplicates exist.
+CREATE INDEX IF NOT EXISTS users_email_lower_idx ON users (lower(email));
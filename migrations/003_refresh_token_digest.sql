@@ -0,0 +1,21 @@
+-- Migration: Store refresh tokens as indexed digests
+-- Date: 2026-10-16
+-- Purpose: Replace bcrypt-hashed refresh tokens (O(N) verify scan per refresh/logout)
+--          with a unique BYTEA digest (HMAC-SHA256 under TOKEN_PEPPER) looked up
+--          by index
+--
+-- !! FORCED GLOBAL LOGOUT !!
+-- Running this migration deletes EVERY refresh token. All users on all
+-- devices are signed out: their next refresh fails with 401 and they must log
+-- in again. Access tokens already issued keep working until they expire.
+--
+-- Why: existing rows hold bcrypt hashes of the token. A bcrypt hash is salted,
+-- so it can't be turned into a lookup digest, and accepting legacy rows would
+-- mean keeping the per-user bcrypt scan this migration removes. Deploy in a
+-- low-traffic window and announce the sign-out beforehand.
+DELETE FROM refresh_tokens;
+
+ALTER TABLE refresh_tokens DROP COLUMN IF EXISTS token;
+ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens (token_hash);
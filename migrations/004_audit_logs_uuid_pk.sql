@@ -0,0 +1,6 @@
+-- Migration: Native UUID primary key for audit_logs
+-- Date: 2026-10-16
+-- Purpose: 16-byte UUID PK instead of 36-char VARCHAR; new rows use
+--          time-ordered UUIDv7 values (generated application-side)
+
+ALTER TABLE audit_logs ALTER COLUMN id TYPE UUID USING id::uuid;
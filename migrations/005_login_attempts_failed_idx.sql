@@ -0,0 +1,9 @@
+-- Migration: Partial index for failed-login reporting
+-- Date: 2026-10-16
+-- Purpose: Failed-login analytics and alerts filter success = false and a
+--          timestamp range, then group by email. Index only the failed rows,
+--          range column first, email included for index-only scans.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_login_attempts_failed_ts_email
+    ON login_attempts (timestamp, email)
+    WHERE success = false;
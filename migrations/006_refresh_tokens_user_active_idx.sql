@@ -0,0 +1,7 @@
+-- Migration: Composite index for active refresh tokens per user
+-- Date: 2026-10-16
+-- Purpose: Session-cap enforcement and revoke-all filter on
+--          user_id = ? AND is_revoked = false AND expires_at > now()
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_refresh_tokens_user_active
+    ON refresh_tokens (user_id, is_revoked, expires_at);
@@ -0,0 +1,7 @@
+-- Migration: Index rule evaluations by their risk decision
+-- Date: 2026-10-16
+-- Purpose: Batched rule loading for GraphQL event resolvers
+--          (risk_decision_id IN (...)); Postgres doesn't index FK columns
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_rule_evaluations_risk_decision_id
+    ON rule_evaluations (risk_decision_id);
@@ -0,0 +1,8 @@
+-- Migration: Composite index for risk decisions by level, newest first
+-- Date: 2026-10-16
+-- Purpose: recentRiskEvents(riskLevel: ...) filters on risk_level and orders
+--          by created_at DESC LIMIT n; (user_id, created_at) is already
+--          covered by ix_risk_decision_user_time
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_risk_decision_level_time
+    ON risk_decisions (risk_level, created_at);
@@ -0,0 +1,19 @@
+-- Migration: Daily risk rollup materialized view
+-- Date: 2026-10-16
+-- Purpose: analyticsSummary reads per-(day, risk_level) totals instead of
+--          scanning risk_decisions; refreshed CONCURRENTLY by the API's
+--          rollup refresher (app/services/analytics_rollup.py), which needs
+--          the unique index
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS risk_daily_rollup AS
+SELECT
+    (created_at AT TIME ZONE 'UTC')::date AS day,
+    risk_level,
+    count(*) AS events,
+    sum(risk_score) AS score_sum,
+    count(*) FILTER (WHERE recommended_action = 'block') AS blocks
+FROM risk_decisions
+GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_risk_daily_rollup_day_level
+    ON risk_daily_rollup (day, risk_level);
@@ -0,0 +1,126 @@
+"""
+GraphQL Analytics Tests
+
+analyticsSummary on a non-PostgreSQL database (the default SQLite
+DATABASE_URL), where there is no risk_daily_rollup view and the summary is
+aggregated live from risk_decisions.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from datetime import timedelta
+import uuid
+
+from app.main import app
+from app.core.db import SessionLocal, engine
+from app.core.security import create_access_token, hash_password
+from app.core.timeutils import utc_now
+from app.models import Base, User
+from app.models.events import RiskDecision
+from app.services.analytics_rollup import ROLLUP_SUPPORTED
+
+pytestmark = pytest.mark.skipif(
+    engine.dialect.name != "sqlite",
+    reason="exercises the live-aggregate fallback used off PostgreSQL"
+)
+
+ANALYTICS_SUMMARY = """
+    query {
+        analyticsSummary(days: 7) {
+            totalEvents
+            criticalEvents
+            highEvents
+            lowEvents
+            averageRiskScore
+            blockRate
+            periodDays
+        }
+    }
+"""
+
+
+@pytest.fixture
+def client():
+    """FastAPI test client (on an allowed host)."""
+    return TestClient(app, base_url="http://localhost")
+
+
+@pytest.fixture
+def admin_user():
+    """Committed admin user, removed afterwards."""
+    Base.metadata.create_all(bind=engine)
+    user = User(
+        id=str(uuid.uuid4()),
+        first_name="Admin",
+        last_name="User",
+        email=f"admin-{uuid.uuid4().hex[:8]}@test.com",
+        password_hash=hash_password("password123"),
+        role="admin",
+        is_active=True,
+        email_verified=True
+    )
+    with SessionLocal() as db:
+        db.add(user)
+        db.commit()
+    yield user
+    with SessionLocal() as db:
+        db.query(User).filter(User.id == user.id).delete()
+        db.commit()
+
+
+@pytest.fixture
+def risk_decisions():
+    """Three decisions inside the 7-day window and one outside it."""
+    user_id = str(uuid.uuid4())
+    now = utc_now()
+    rows = [
+        ("CRITICAL", 0.9, "block", now - timedelta(hours=1)),
+        ("HIGH", 0.7, "challenge", now - timedelta(days=2)),
+        ("LOW", 0.2, "allow", now - timedelta(days=6)),
+        ("CRITICAL", 1.0, "block", now - timedelta(days=10)),
+    ]
+    with SessionLocal() as db:
+        db.add_all([
+            RiskDecision(
+                id=str(uuid.uuid4()),
+                event_id=str(uuid.uuid4()),
+                user_id=user_id,
+                event_type="login",
+                risk_score=score,
+                risk_level=level,
+                decision=action,
+                recommended_action=action,
+                confidence=1.0,
+                created_at=created_at
+            )
+            for level, score, action, created_at in rows
+        ])
+        db.commit()
+    yield user_id
+    with SessionLocal() as db:
+        db.query(RiskDecision).filter(RiskDecision.user_id == user_id).delete()
+        db.commit()
+
+
+def test_analytics_summary_aggregates_live_on_sqlite(client, admin_user, risk_decisions):
+    """analyticsSummary answers from risk_decisions when the rollup view can't exist."""
+    assert not ROLLUP_SUPPORTED
+    token = create_access_token(data={"sub": admin_user.id}, expires_delta=timedelta(hours=1))
+
+    response = client.post(
+        "/graphql",
+        json={"query": ANALYTICS_SUMMARY},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body.get("errors") is None
+    summary = body["data"]["analyticsSummary"]
+    # Other tests may leave decisions behind; ours are a lower bound
+    assert summary["totalEvents"] >= 3
+    assert summary["criticalEvents"] >= 1
+    assert summary["highEvents"] >= 1
+    assert summary["lowEvents"] >= 1
+    assert summary["blockRate"] > 0
+    assert summary["periodDays"] == 7
@@ -0,0 +1,102 @@
+"""
+PII Scrubber Pattern Tests
+
+Table-driven checks for the EMAIL and PHONE patterns: where a match may
+start, which separators and parentheses it accepts, and that inputs which
+used to scan quadratically can't by construction.
+"""
+
+import re
+
+import pytest
+
+from app.core.pii_scrubber import PIIPatterns, PIIScrubber, RedactionMasks
+
+
+def _first_match(pattern, text):
+    match = pattern.search(text)
+    return match.group() if match else None
+
+
+# ========== EMAIL ==========
+
+@pytest.mark.parametrize("text, expected", [
+    # Plain addresses
+    ("user@example.com", "user@example.com"),
+    ("first.last+tag@mail.example.org", "first.last+tag@mail.example.org"),
+    # Lookbehind: a match starts at the beginning of the local-part run,
+    # never part-way through it
+    ("reach me at jane_doe@example.com today", "jane_doe@example.com"),
+    ("x%y-z@example.io", "x%y-z@example.io"),
+    # TLD class is [A-Za-z]: a literal "|" is not part of a TLD
+    ("a@b.c|m", None),
+    ("a@b.c|om", None),
+    ("user@example.co|m", "user@example.co"),
+    # Not addresses
+    ("user@localhost", None),
+    ("no at sign here", None),
+])
+def test_email_pattern(text, expected):
+    assert _first_match(PIIPatterns.EMAIL, text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "a." * 2_000,
+    "a-" * 2_000,
+    ("a." * 2_000) + "@",
+    ("a." * 2_000) + "@example",
+])
+def test_email_pattern_ignores_runs_without_address(text):
+    assert PIIPatterns.EMAIL.search(text) is None
+
+
+def test_email_pattern_starts_only_at_run_boundaries():
+    # Without the lookbehind a run with no "@" is rescanned from every start
+    # position (quadratic); with it a match can only begin where a run begins
+    assert PIIPatterns.EMAIL.pattern.startswith("(?<![A-Za-z0-9._%+-])")
+
+
+@pytest.mark.parametrize("pattern", [PIIPatterns.EMAIL, PIIPatterns.PHONE])
+def test_pattern_has_no_nested_quantifiers(pattern):
+    # A repeated group (")+", ")*", "){n,}") around a quantified body is what
+    # makes backtracking exponential; these patterns only repeat single classes
+    assert re.search(r"(?<!\\)\)(?:[+*]|\{)", pattern.pattern) is None
+
+
+# ========== PHONE ==========
+
+@pytest.mark.parametrize("text, expected", [
+    # Accepted separators and country prefix
+    ("555-123-4567", "555-123-4567"),
+    ("555.123.4567", "555.123.4567"),
+    ("555 123 4567", "555 123 4567"),
+    ("5551234567", "5551234567"),
+    ("(555) 123-4567", "(555) 123-4567"),
+    ("(555)123-4567", "(555)123-4567"),
+    ("+1 555-123-4567", "+1 555-123-4567"),
+    ("1-555-123-4567", "1-555-123-4567"),
+    # The separator before the number is not part of the match
+    ("call 555-123-4567", "555-123-4567"),
+    ("tel:.555.123.4567", "555.123.4567"),
+    # Area code is "(555)" or "555": a half-open paren is never matched
+    ("(555 123-4567", "555 123-4567"),
+    ("555) 123-4567", None),
+    # No match starting inside a longer word or digit run
+    ("12345551234567", None),
+    ("order_5551234567", None),
+    ("id5551234567", None),
+    ("++5551234567", None),
+])
+def test_phone_pattern(text, expected):
+    assert _first_match(PIIPatterns.PHONE, text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("call 555-123-4567 now", f"call {RedactionMasks.PHONE} now"),
+    ("call\t(555) 123-4567", f"call\t{RedactionMasks.PHONE}"),
+    ("mail jane@example.com, call 555.123.4567",
+     f"mail {RedactionMasks.EMAIL}, call {RedactionMasks.PHONE}"),
+    ("a@b.c|m", "a@b.c|m"),
+])
+def test_scrub_string_keeps_surrounding_text(text, expected):
+    assert PIIScrubber.scrub_string(text) == expected
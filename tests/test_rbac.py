@@ -15,7 +15,7 @@ from app.core.db import SessionLocal, engine
 from app.models import Base, User, AuditLog, Organization
 from app.core.security import hash_password
 from app.services.token_service import create_access_token
-from app.config import ROLES, SECRET_KEY, ALGORITHM
+from app.config import ROLES, PERMISSION_ROLES, ROLE_PERMISSIONS, has_permission, SECRET_KEY, ALGORITHM
 
 # Setup test database
 @pytest.fixture(scope="session", autouse=True)
@@ -354,6 +354,16 @@ class TestRoleConfiguration:
         viewer_perms = ROLES["viewer"]["permissions"]
         assert "profile.read_own" in viewer_perms
         assert "admin.dashboard" not in viewer_perms
+    
+    def test_permission_lookups_match_roles(self):
+        """Precomputed lookups should agree with ROLES."""
+        for role, config in ROLES.items():
+            assert ROLE_PERMISSIONS[role] == frozenset(config["permissions"])
+            for permission in config["permissions"]:
+                assert role in PERMISSION_ROLES[permission]
+                assert has_permission(role, permission)
+        assert not has_permission("viewer", "admin.dashboard")
+        assert not has_permission("unknown_role", "profile.read_own")
 
 
 class TestUnauthorizedAccess: